@@ -0,0 +1,349 @@
+"""本地压测：用模拟的 Context 和消息事件驱动上百个并发房间
+
+不连接任何平台，Context.send_message 由 MockContext 代替（可配置延迟与失败率），
+每个群里的玩家按 simulate.RandomAgent 的策略通过插件的 on_message 发送指令，
+阶段时长按 --time-scale 缩短。结束后报告指令吞吐、阶段切换延迟分位数和峰值内存。
+
+没有安装 AstrBot 时，main.py 导入的 astrbot 模块由最小的替身代替，压测可以离线运行。
+在插件目录下运行：
+
+    python loadtest.py --groups 200 --players 8 --rate 2000 --latency 0.02 --failure-rate 0.01
+"""
+import os
+import sys
+import enum
+import json
+import time
+import types
+import random
+import asyncio
+import logging
+import argparse
+import itertools
+import tempfile
+import importlib
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 插件默认阶段时长（秒），按 --time-scale 缩放
+BASE_TIMEOUTS = {
+    "night_timeout": 120,
+    "day_timeout": 180,
+    "vote_timeout": 60,
+    "take_timeout": 30,
+}
+
+
+def stub_astrbot():
+    """没有安装 AstrBot 时，在 sys.modules 中放入 main.py 导入的最小替身模块"""
+    try:
+        importlib.import_module("astrbot.api")
+        return
+    except ImportError:
+        pass
+
+    def passthrough(*args, **kwargs):
+        return lambda target: target
+
+    class Star:
+        def __init__(self, context):
+            self.context = context
+
+    modules = {
+        "astrbot": {},
+        "astrbot.api": {"AstrBotConfig": dict, "logger": logging.getLogger("astrbot")},
+        "astrbot.api.message_components": {},
+        "astrbot.api.event": {
+            "AstrMessageEvent": object,
+            "filter": types.SimpleNamespace(event_message_type=passthrough, platform_adapter_type=passthrough),
+        },
+        "astrbot.api.star": {"Context": object, "Star": Star, "register": passthrough},
+        "astrbot.core": {},
+        "astrbot.core.message": {},
+        "astrbot.core.message.message_event_result": {"MessageChain": list},
+        "astrbot.core.platform": {},
+        "astrbot.core.platform.message_type": {"MessageType": enum.Enum("MessageType", "GROUP PRIVATE")},
+        "astrbot.core.star": {},
+        "astrbot.core.star.filter": {},
+        "astrbot.core.star.filter.event_message_type": {"EventMessageType": enum.Enum("EventMessageType", "ALL")},
+        "astrbot.core.star.filter.platform_adapter_type": {
+            "PlatformAdapterType": enum.Enum("PlatformAdapterType", "AIOCQHTTP"),
+        },
+    }
+    for name, attrs in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(sys.modules[parent], child, module)
+
+
+def load_plugin():
+    """以包的形式导入插件（main.py 使用相对导入）"""
+    stub_astrbot()
+    sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+    package = os.path.basename(PLUGIN_DIR)
+    main = importlib.import_module(f"{package}.main")
+    werewolf = importlib.import_module(f"{package}.werewolf")
+    dispatch = importlib.import_module(f"{package}.werewolf.dispatch")
+    simulate = importlib.import_module(f"{package}.werewolf.simulate")
+    return main, werewolf, dispatch, simulate
+
+
+class MockContext:
+    """代替 AstrBot Context，只实现插件用到的 send_message"""
+
+    def __init__(self, latency: float, failure_rate: float, rng: random.Random):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = rng
+        self.sent = 0
+        self.failed = 0
+
+    async def send_message(self, message_type, target: str, content: str):
+        if self.latency > 0:
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.latency)
+        if self.rng.random() < self.failure_rate:
+            self.failed += 1
+            raise ConnectionError("模拟发送失败")
+        self.sent += 1
+
+
+class MockEvent:
+    """代替 AstrMessageEvent，提供 on_message 读取的字段"""
+
+    def __init__(self, sender_id: str, sender_name: str, group_id: str, text: str, message_id: str):
+        self.message_str = text
+        self.message_obj = types.SimpleNamespace(message_id=message_id)
+        self._sender_id = sender_id
+        self._sender_name = sender_name
+        self._group_id = group_id
+
+    def get_sender_id(self) -> str:
+        return self._sender_id
+
+    def get_sender_name(self) -> str:
+        return self._sender_name
+
+    def get_group_id(self) -> str:
+        return self._group_id
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    """延迟分位数（毫秒）"""
+    return {
+        name: round(percentile(values, q) * 1000, 2)
+        for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))
+    }
+
+
+class LoadTest:
+    """驱动多个房间并收集统计"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.main, werewolf, dispatch, simulate = load_plugin()
+        self.GamePhase = werewolf.GamePhase
+        self.rng = random.Random(args.seed)
+        self.context = MockContext(args.latency, args.failure_rate, self.rng)
+        self.agent = simulate.RandomAgent()
+        self.bucket = dispatch.TokenBucket(args.rate, max(1, int(args.rate)))
+        self.message_ids = itertools.count(1)
+        self.data_dir = tempfile.TemporaryDirectory(prefix="werewolf-loadtest-")
+
+        config: Dict[str, Any] = {
+            "max_players": max(args.players, 12),
+            "send_rate": args.send_rate,
+            "send_burst": max(1, int(args.send_rate)),
+            "send_concurrency": args.send_concurrency,
+            "send_retries": 1,
+            "group_merge_window": 0.05,
+            "enable_journal": args.journal,
+            "enable_stats": args.stats,
+            "data_dir": self.data_dir.name,
+            "max_sessions": 0,  # 压测房间数可能超过默认上限
+            "command_rate": 0,  # 压缩时间后玩家发指令的频率远高于真实对局
+        }
+        config.update({key: value * args.time_scale for key, value in BASE_TIMEOUTS.items()})
+        self.timeouts = config
+        self.plugin = self.main.FailWerewolfPlugin(self.context, config)
+
+        self.commands = 0
+        self.transitions: Dict[str, List[float]] = {}  # 切换类型 -> 阶段切换延迟（秒）
+        self.finished = 0
+
+    async def send(self, group_id: str, user_id: str, name: str, text: str, private: bool = False):
+        """按目标速率把一条消息交给 on_message"""
+        await self.bucket.acquire()
+        self.commands += 1
+        group = "" if private else group_id
+        await self.plugin.on_message(MockEvent(user_id, name, group, text, str(next(self.message_ids))))
+
+    async def drive_room(self, group_id: str):
+        """一个群从发起报名到游戏结束的完整流程"""
+        players = [(f"{group_id}-u{i}", f"p{i}") for i in range(self.args.players)]
+        master_id, master_name = players[0]
+        await self.send(group_id, master_id, master_name, "挂科狼人杀")
+        for user_id, name in players:
+            await self.send(group_id, user_id, name, "报名")
+        started = time.perf_counter()
+        await self.send(group_id, master_id, master_name, "开始游戏")
+
+        expected = started  # 当前阶段预期结束的时间，观察到新阶段时计算延迟
+        last_key = None
+        while True:
+            # 对局结束后房间会在写完战绩等收尾工作后移出注册表
+            session = self.plugin.app.sessions.get(group_id)
+            if session is None:
+                break
+            key = (session.game_phase, session.day_count)
+            # 开始游戏后发牌在阶段回调中进行，报名阶段要等到进入第一夜才算开局
+            if key != last_key and session.game_phase not in (self.GamePhase.REGISTERING, self.GamePhase.ENDED):
+                now = time.perf_counter()
+                if expected is not None:
+                    # 开局（发牌并进入第一夜）单独统计，其余按进入的阶段统计
+                    label = "开局" if last_key is None else f"进入{session.game_phase.value}"
+                    self.transitions.setdefault(label, []).append(max(0.0, now - expected))
+                last_key = key
+                expected = await self.play_phase(group_id, session)
+            for user_id in session.pending_choices:
+                await self.take(group_id, session, user_id)
+            await asyncio.sleep(self.args.poll)
+        self.finished += 1
+
+    async def play_phase(self, group_id: str, session) -> Optional[float]:
+        """按阶段让玩家行动，返回本阶段预期结束的时间"""
+        engine = session.engine
+        phase = session.game_phase
+        if phase == self.GamePhase.NIGHT:
+            for user_id in list(session.night_actors):
+                player = session.players[user_id]
+                action = self.agent.night_action(engine, player) or "跳过"
+                await self.send(group_id, user_id, player.user_name, f"/行动 {action}", private=True)
+                if user_id not in engine.night_actions and session.game_phase == phase:
+                    # 行动被拒绝（如连续保护同一人），改为跳过
+                    await self.send(group_id, user_id, player.user_name, "/行动 跳过", private=True)
+            return time.perf_counter()
+        if phase == self.GamePhase.DAY:
+            speakers = session.index.alive_players()[:self.args.speeches]
+            for player in speakers:
+                await self.send(group_id, player.user_id, player.user_name, f"/发言 我是{player.user_name}，我是好人")
+            return time.perf_counter() + self.timeouts["day_timeout"]
+        if phase == self.GamePhase.VOTING:
+            for player in session.index.alive_players():
+                target = self.agent.vote(engine, player)
+                if target and session.game_phase == phase:
+                    await self.send(group_id, player.user_id, player.user_name, f"/投票 {target}")
+            return time.perf_counter()
+        return None
+
+    async def take(self, group_id: str, session, user_id: str):
+        """助教选择带走目标"""
+        shooter = session.players[user_id]
+        target = self.agent.take(session.engine, shooter, session.engine.shoot_candidates(shooter))
+        if target is not None:
+            await self.send(group_id, user_id, shooter.user_name, f"/带走 {target.user_name}")
+
+    async def run(self) -> Dict[str, Any]:
+        if self.args.tracemalloc:
+            tracemalloc.start()
+        await self.plugin.initialize()
+        started = time.perf_counter()
+        rooms = [asyncio.create_task(self.drive_room(f"load{i}")) for i in range(self.args.groups)]
+        done, pending = await asyncio.wait(rooms, timeout=self.args.max_seconds)
+        for task in pending:
+            task.cancel()
+        elapsed = time.perf_counter() - started
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+
+        await self.plugin.terminate()
+        # 等待结束对局时创建的后台任务（写日志、战绩等）
+        await asyncio.sleep(0.1)
+        self.data_dir.cleanup()
+
+        latencies = [value for values in self.transitions.values() for value in values]
+        report = {
+            "groups": self.args.groups,
+            "players": self.args.players,
+            "finished": self.finished,
+            "seconds": round(elapsed, 3),
+            "commands": self.commands,
+            "commands_per_second": round(self.commands / elapsed, 1) if elapsed else 0.0,
+            "sent": self.context.sent,
+            "send_failures": self.context.failed,
+            "transitions": len(latencies),
+            "transition_ms": latency_summary(latencies),
+            "transition_ms_by_phase": {phase: latency_summary(values) for phase, values in self.transitions.items()},
+        }
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            report["peak_rss_mb"] = round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+        if self.args.tracemalloc:
+            report["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            tracemalloc.stop()
+        return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    ms = report["transition_ms"]
+    lines = [
+        f"房间 {report['groups']} 个 × {report['players']} 人，完成 {report['finished']} 局，用时 {report['seconds']:.2f} 秒",
+        f"指令 {report['commands']} 条（{report['commands_per_second']:.0f} 条/秒）",
+        f"发送 {report['sent']} 条，失败 {report['send_failures']} 次",
+        f"阶段切换 {report['transitions']} 次，延迟 p50 {ms['p50']}ms / p90 {ms['p90']}ms / p99 {ms['p99']}ms / 最大 {ms['max']}ms",
+    ]
+    for phase, ms in report["transition_ms_by_phase"].items():
+        lines.append(f"  {phase}：p50 {ms['p50']}ms / p99 {ms['p99']}ms / 最大 {ms['max']}ms")
+    if "peak_rss_mb" in report:
+        lines.append(f"峰值内存 RSS {report['peak_rss_mb']} MB")
+    if "peak_traced_mb" in report:
+        lines.append(f"Python 分配峰值 {report['peak_traced_mb']} MB（tracemalloc）")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="挂科狼人杀本地压测")
+    parser.add_argument("--groups", type=int, default=100, help="并发房间数")
+    parser.add_argument("--players", type=int, default=8, help="每个房间的人数")
+    parser.add_argument("--rate", type=float, default=2000, help="所有房间合计每秒发送的指令数（0 为不限）")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟发送延迟（秒，实际在 0.5-1.5 倍之间浮动）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="模拟发送失败率")
+    parser.add_argument("--send-rate", type=float, default=0, help="插件的 send_rate 配置（0 为不限速）")
+    parser.add_argument("--send-concurrency", type=int, default=50, help="插件的 send_concurrency 配置")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="阶段时长缩放比例")
+    parser.add_argument("--speeches", type=int, default=2, help="每个白天发言的人数")
+    parser.add_argument("--poll", type=float, default=0.005, help="玩家查看阶段变化的间隔（秒）")
+    parser.add_argument("--max-seconds", type=float, default=600, help="整体超时（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--journal", action="store_true", help="开启游戏日志")
+    parser.add_argument("--stats", action="store_true", help="开启战绩记录")
+    parser.add_argument("--tracemalloc", action="store_true", help="用 tracemalloc 统计 Python 分配峰值（较慢）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出报告")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(LoadTest(args).run())
+    print(json.dumps(report, ensure_ascii=False) if args.json else format_report(report))
+    # 有房间没在规定时间内结束时返回非零，便于在 CI 中使用
+    return 0 if report["finished"] == args.groups else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import asyncio
+
+from werewolf.app import IncomingMessage, WerewolfApp
+
+from test_journal import FakeMessenger
+
+
+def make_app(tmp_path) -> WerewolfApp:
+    config = {"data_dir": str(tmp_path), "enable_stats": False, "send_rate": 0, "group_merge_window": 0}
+    return WerewolfApp(config, FakeMessenger())
+
+
+def test_accepts_only_rooms_players_and_commands(tmp_path):
+    async def run():
+        app = make_app(tmp_path)
+        assert not app.accepts("g1", "u0", "今天吃什么")
+        assert app.accepts("g1", "u0", "挂科狼人杀")
+        assert app.accepts("", "u0", "我的战绩")
+        assert not app.accepts("", "u0", "在吗")
+
+        await app.handle(IncomingMessage("m", "M", "g1", "挂科狼人杀"))
+        await app.handle(IncomingMessage("u0", "n0", "g1", "报名"))
+        # 有房间的群和已报名玩家的私聊全部放行
+        assert app.accepts("g1", "u1", "今天吃什么")
+        assert app.accepts("", "u0", "在吗")
+        assert not app.accepts("g2", "u1", "今天吃什么")
+        await app.terminate()
+
+    asyncio.run(run())
+
+
+def test_duplicate_ids_are_only_recorded_for_commands(tmp_path):
+    async def run():
+        app = make_app(tmp_path)
+        await app.handle(IncomingMessage("m", "M", "g1", "挂科狼人杀", "1"))
+        # 有房间的群里的普通聊天不进入去重表
+        await app.handle(IncomingMessage("u0", "n0", "g1", "大家好", "2"))
+        assert len(app.recent_ids) == 1
+        await app.handle(IncomingMessage("u0", "n0", "g1", "报名", "3"))
+        await app.handle(IncomingMessage("u0", "n0", "g1", "报名", "3"))
+        session = app.sessions.get("g1")
+        assert list(session.players) == ["u0"]
+        assert len(app.recent_ids) == 2
+        await app.terminate()
+
+    asyncio.run(run())
@@ -0,0 +1,120 @@
+import asyncio
+import random
+
+from werewolf.app import IncomingMessage, WerewolfApp
+from werewolf.dispatch import DeliveryResult
+from werewolf.journal import GameJournal, load_journals
+from werewolf.models import GamePhase
+from werewolf.session import GameSession
+from werewolf.settings import GameSettings
+from werewolf.timers import DeadlineService
+
+
+class FakeMessenger:
+    """记录发出的消息；hang_private 为真时群发私聊一直不返回（模拟私聊身份期间进程崩溃）"""
+
+    def __init__(self, hang_private: bool = False):
+        self.group = []
+        self.private = []
+        self.hang_private = hang_private
+        self.hung = asyncio.Event()
+
+    async def send_group(self, group_id, content):
+        self.group.append(content)
+
+    async def send_private(self, user_id, content):
+        self.private.append((user_id, content))
+
+    async def send_private_many(self, messages):
+        if self.hang_private:
+            self.hung.set()
+            await asyncio.Event().wait()
+        self.private.extend(messages)
+        return {user_id: DeliveryResult(user_id, True, 1) for user_id, _ in messages}
+
+
+def make_session(directory, messenger, deadlines) -> GameSession:
+    return GameSession(
+        "g1", GameSettings(), messenger,
+        deadlines=deadlines, rng=random.Random(1), journal=GameJournal(str(directory), "g1"),
+    )
+
+
+async def resume_from_disk(directory, deadlines) -> GameSession:
+    """模拟重启：只凭磁盘上的快照和日志恢复房间"""
+    games = load_journals(str(directory))
+    assert len(games) == 1
+    state, events = games[0]
+    session = make_session(directory, FakeMessenger(), deadlines)
+    assert await session.resume(state, events)
+    return session
+
+
+def test_resume_keeps_registrations(tmp_path):
+    async def run():
+        deadlines = DeadlineService()
+        session = make_session(tmp_path, FakeMessenger(), deadlines)
+        await session.start_registration("m")
+        for i in range(3):
+            await session.register_player(f"u{i}", f"n{i}")
+        session.scheduler.cancel()
+
+        restored = await resume_from_disk(tmp_path, deadlines)
+        assert restored.game_phase == GamePhase.REGISTERING
+        assert sorted(restored.players) == ["u0", "u1", "u2"]
+        restored.scheduler.cancel()
+        deadlines.close()
+
+    asyncio.run(run())
+
+
+def test_restart_between_deal_and_night_keeps_roles(tmp_path):
+    async def run():
+        deadlines = DeadlineService()
+        messenger = FakeMessenger(hang_private=True)
+        session = make_session(tmp_path, messenger, deadlines)
+        await session.start_registration("m")
+        for i in range(6):
+            await session.register_player(f"u{i}", f"n{i}")
+        await session.request_start()
+        # 私聊身份时“崩溃”：第一夜还没有开始
+        await asyncio.wait_for(messenger.hung.wait(), 5)
+        roles = {user_id: player.role for user_id, player in session.players.items()}
+        session.scheduler.cancel()
+
+        restored = await resume_from_disk(tmp_path, deadlines)
+        assert restored.game_phase == GamePhase.NIGHT
+        assert restored.day_count == 1
+        assert {user_id: player.role for user_id, player in restored.players.items()} == roles
+        assert restored.night_actors
+        # 重启后补发了每个人的身份
+        assert {user_id for user_id, _ in restored.messenger.private} >= set(roles)
+        restored.scheduler.cancel()
+        deadlines.close()
+
+    asyncio.run(run())
+
+
+def test_terminate_flushes_buffered_events(tmp_path):
+    async def run():
+        config = {"data_dir": str(tmp_path), "enable_stats": False, "send_rate": 0, "group_merge_window": 0}
+        app = WerewolfApp(config, FakeMessenger())
+        await app.initialize()
+        await app.handle(IncomingMessage("m", "M", "g1", "挂科狼人杀"))
+        for i in range(6):
+            await app.handle(IncomingMessage(f"u{i}", f"n{i}", "g1", "报名"))
+        await app.handle(IncomingMessage("m", "M", "g1", "开始游戏"))
+        session = app.sessions.get("g1")
+        for _ in range(100):
+            if session.day_count == 1 and session.night_actors:
+                break
+            await asyncio.sleep(0.01)
+        actor = sorted(session.night_actors)[0]
+        await app.handle(IncomingMessage(actor, "", "", "/行动 跳过"))
+        assert session.journal.pending
+        await app.terminate()
+
+        (_, events), = load_journals(str(tmp_path))
+        assert any(event.get("op") == "act" and event.get("uid") == actor for event in events)
+
+    asyncio.run(run())
@@ -0,0 +1,43 @@
+import pytest
+
+from werewolf.index import PlayerIndex
+from werewolf.models import Player, PlayerStatus, RuleError
+
+
+def make_index(*names: str) -> PlayerIndex:
+    index = PlayerIndex()
+    for i, name in enumerate(names):
+        index.add(Player(user_id=f"u{i}", user_name=name, group_id="g1"))
+    return index
+
+
+def test_exact_normalized_and_seat_lookups():
+    index = make_index("Alice", "Ｂｏｂ 🎮", "Carol")
+    assert index.resolve("Alice").user_id == "u0"
+    assert index.resolve("bob").user_id == "u1"
+    assert index.resolve("3号").user_id == "u2"
+    assert index.resolve("@u2").user_id == "u2"
+    assert index.resolve("Dave") is None
+
+
+def test_ambiguous_prefix_lists_candidates():
+    index = make_index("Alice", "Alicia", "Bob")
+    assert index.resolve("bo").user_id == "u2"
+    with pytest.raises(RuleError) as excinfo:
+        index.resolve("ali")
+    assert "1号Alice" in str(excinfo.value) and "2号Alicia" in str(excinfo.value)
+
+
+def test_ambiguous_prefix_prefers_living_players():
+    index = make_index("Alice", "Alicia", "Bob")
+    index.set_status(index.get("u0"), PlayerStatus.DROPPED)
+    assert index.resolve("ali").user_id == "u1"
+
+
+def test_prefix_table_includes_players_added_later():
+    index = make_index("Alice", "Bob")
+    assert index.resolve("al").user_id == "u0"
+    index.add(Player(user_id="u2", user_name="Alan", group_id="g1"))
+    with pytest.raises(RuleError):
+        index.resolve("al")
+    assert index.resolve("alan").user_id == "u2"
@@ -0,0 +1,38 @@
+from werewolf.tally import VoteTally
+
+
+def test_decided_when_lead_exceeds_remaining_ballots():
+    tally = VoteTally()
+    for voter in ("a", "b", "c", "d"):
+        tally.cast(voter, "x")
+    # 6 人中已有 4 票投给 x，剩下 2 票无法追平
+    assert tally.is_decided(6)
+    assert not tally.is_decided(9)
+
+
+def test_tie_is_not_decided_until_everyone_voted():
+    tally = VoteTally()
+    tally.cast("a", "x")
+    tally.cast("b", "y")
+    assert not tally.is_decided(3)
+    tally.cast("c", "x")
+    assert tally.is_decided(3)
+
+
+def test_revote_waits_for_all_ballots_even_with_a_majority():
+    tally = VoteTally()
+    for voter in ("a", "b", "c", "d"):
+        tally.cast(voter, "x")
+    assert not tally.is_decided(6, allow_revote=True)
+    tally.cast("e", "y")
+    tally.cast("f", "y")
+    assert tally.is_decided(6, allow_revote=True)
+
+
+def test_changed_ballot_moves_between_targets():
+    tally = VoteTally()
+    tally.cast("a", "x")
+    tally.cast("b", "x")
+    assert tally.cast("a", "y") == "x"
+    assert sorted(tally.leaders()) == ["x", "y"]
+    assert tally.leader() is None
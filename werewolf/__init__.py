@@ -0,0 +1,15 @@
+"""挂科狼人杀游戏核心（不依赖 AstrBot，可脱离框架运行）"""
+
+from .models import GamePhase, Player, PlayerStatus, Role
+from .session import GameSession, SessionRegistry
+from .settings import GameSettings
+
+__all__ = [
+    "GamePhase",
+    "GameSession",
+    "GameSettings",
+    "Player",
+    "PlayerStatus",
+    "Role",
+    "SessionRegistry",
+]
@@ -0,0 +1,396 @@
+"""插件的平台无关部分：指令路由、房间管理、持久化与指标
+
+main.py 把 AstrBot 的消息事件转换成 IncomingMessage 交给 WerewolfApp.handle，
+发送则通过传入的 messenger（提供 send_private / send_group 协程方法）完成。
+多进程模式下每个工作进程各运行一个 WerewolfApp（见 sharding 模块）。
+"""
+import os
+import asyncio
+import logging
+from typing import Callable, Optional, Tuple
+from dataclasses import dataclass
+
+from .dispatch import FanoutMessenger
+from .journal import DEFAULT_DATA_DIR, GameJournal, load_journals
+from .flood import FloodGuard, RecentIds
+from .lifecycle import SessionLifecycle
+from .metrics import REGISTRY
+from .router import CommandRouter
+from .session import GameSession, SessionRegistry
+from .settings import GameSettings
+from .stats import StatsStore
+from .tracing import Tracer
+from .timers import DeadlineService
+
+logger = logging.getLogger("astrbot")
+
+
+@dataclass
+class IncomingMessage:
+    """平台无关的入站消息"""
+    sender_id: str
+    sender_name: str
+    group_id: str  # 私聊为空字符串
+    text: str
+    message_id: str = ""  # 平台消息 id，用于丢弃重复投递的事件
+
+
+class WerewolfApp:
+    """一个进程内的全部房间"""
+
+    # 在没有房间的群里发起报名的指令
+    START_COMMANDS = ("挂科狼人杀", "failwerewolf", "开始报名")
+
+    # 指令表：(指令名, 写法, 处理函数名, 是否完全匹配, 是否必须带参数)，别名指向同一个处理函数
+    COMMANDS = (
+        ("报名", ("报名", "join"), "_cmd_register", False, False),
+        ("开始游戏", ("开始游戏", "start"), "_cmd_start", False, False),
+        ("发起报名", START_COMMANDS, "_cmd_open", True, False),
+        ("投票", ("/投票", "/vote"), "_cmd_vote", False, True),
+        ("发言", ("/发言", "/say"), "_cmd_speech", False, True),
+        ("行动", ("/行动", "/act"), "_cmd_night_action", False, True),
+        ("带走", ("/带走", "/shoot"), "_cmd_take", False, True),
+        ("设置", ("/设置", "/set"), "_cmd_settings", False, True),
+        ("游戏规则", ("游戏规则", "rules"), "_cmd_rules", True, False),
+        ("游戏状态", ("游戏状态", "status"), "_cmd_status", True, False),
+        ("取消游戏", ("取消游戏", "cancel"), "_cmd_cancel", True, False),
+        ("我的战绩", ("我的战绩", "mystats"), "_cmd_my_stats", True, False),
+        ("排行榜", ("排行榜", "rank"), "_cmd_rank", True, False),
+        ("狼人杀指标", ("狼人杀指标", "metrics"), "_cmd_metrics", True, False),
+        ("导出追踪", ("导出追踪", "trace"), "_cmd_trace", True, False),
+        ("房间列表", ("狼人杀房间", "rooms"), "_cmd_rooms", True, False),
+    )
+    # 没有房间时也可使用的指令，handler 收到的 session 为 None
+    LOBBY_COMMANDS = ("我的战绩", "排行榜", "狼人杀指标", "房间列表")
+    # 所有指令写法，用于在构造消息之前快速判断一条消息可能是指令
+    COMMAND_PREFIXES = tuple(alias for _, aliases, _, _, _ in COMMANDS for alias in aliases)
+
+    def __init__(
+        self,
+        config,
+        messenger,
+        shard: Optional[Tuple[int, int]] = None,
+        on_bind: Optional[Callable[[str, bool], None]] = None,
+        on_room: Optional[Callable[[str, bool], None]] = None,
+    ):
+        self.config = config
+        self.settings = GameSettings.from_config(config)
+        self.shard = shard  # (本进程序号, 进程总数)，单进程时为 None
+        # 私聊并发上限与整体发送限速（令牌桶），需与平台风控限制匹配
+        self.messenger = FanoutMessenger(
+            messenger,
+            concurrency=config.get("send_concurrency", 5),
+            rate=config.get("send_rate", 10),
+            burst=config.get("send_burst", 10),
+            retries=config.get("send_retries", 1),
+        )
+
+        # 重复投递的事件按消息 id 丢弃；没有房间时可用的指令按用户限频
+        self.recent_ids = RecentIds()
+        self.lobby_flood = FloodGuard(
+            self.settings.command_rate, self.settings.command_burst, self.settings.repeat_window,
+        )
+
+        # 所有房间共用一个截止时间服务（最小堆 + 单个驱动任务）
+        self.deadlines = DeadlineService()
+
+        # 插件数据目录（游戏日志与快照），关闭 enable_journal 后重启会丢失进行中的游戏
+        self.data_dir = config.get("data_dir") or DEFAULT_DATA_DIR
+        self.enable_journal = config.get("enable_journal", True)
+        # 追踪：每个房间记录阶段与发送的 span，对局结束时导出到 traces 目录
+        self.enable_tracing = config.get("enable_tracing", False)
+
+        # 战绩存储（SQLite）
+        self.stats = StatsStore(os.path.join(self.data_dir, "stats.db")) if config.get("enable_stats", True) else None
+
+        # 房间注册表：group_id -> GameSession
+        self.sessions = SessionRegistry(self._create_session, on_bind, on_room)
+        # 房间回收：idle_timeout 秒无活动的房间自动关闭，房间数达到 max_sessions 时
+        # 关闭最久未活动的空闲或报名中房间，没有可关闭的房间时拒绝新建
+        self.lifecycle = SessionLifecycle(
+            self.sessions,
+            self.deadlines,
+            idle_timeout=config.get("idle_timeout", 1800),
+            max_sessions=config.get("max_sessions", 500),
+        )
+
+        # 指令路由表；lobby_router 中的指令在没有房间时也可使用
+        self.router = self._build_router()
+        self.lobby_router = self._build_router(self.LOBBY_COMMANDS)
+
+        # 指标：活跃房间数与指令计数在导出时读取，不占用热路径
+        REGISTRY.function(
+            "werewolf_active_sessions", "当前房间数", "gauge",
+            lambda: {(): len(self.sessions)},
+        )
+        REGISTRY.function(
+            "werewolf_commands_total", "各指令的分发次数", "counter",
+            lambda: {(name,): count for name, count in (self.router.counts + self.lobby_router.counts).items()},
+            ("command",),
+        )
+        REGISTRY.function(
+            "werewolf_session_memory_bytes", "全部房间状态占用的内存估算", "gauge",
+            lambda: {(): self.lifecycle.report(0)[0]},
+        )
+        # 定期把指标写到文件（metrics_interval 秒，0 为不写），多进程时每个进程各写一个文件
+        suffix = f"-{shard[0]}" if shard else ""
+        self.metrics_path = os.path.join(self.data_dir, f"metrics{suffix}.prom")
+        self.metrics_interval = config.get("metrics_interval", 0)
+        self._metrics_timer = None
+        if self.metrics_interval > 0:
+            self._schedule_metrics_dump()
+
+    def _create_session(self, group_id: str, registry: SessionRegistry) -> GameSession:
+        """创建新房间，每个房间持有一份独立配置"""
+        return GameSession(
+            group_id,
+            GameSettings.from_config(self.config),
+            self.messenger,
+            registry,
+            self.deadlines,
+            journal=GameJournal(self.data_dir, group_id) if self.enable_journal else None,
+            stats=self.stats,
+            tracer=Tracer(f"群 {group_id}", os.path.join(self.data_dir, "traces")) if self.enable_tracing else None,
+        )
+
+    def owns(self, group_id: str) -> bool:
+        """群是否归本进程管理"""
+        if self.shard is None:
+            return True
+        from .sharding import shard_for
+        return shard_for(group_id, self.shard[1]) == self.shard[0]
+
+    async def initialize(self):
+        """开始回收空闲房间，并恢复重启前未结束的游戏"""
+        self.lifecycle.start()
+        if not self.enable_journal:
+            return
+        loop = asyncio.get_running_loop()
+        for state, events in await loop.run_in_executor(None, load_journals, self.data_dir):
+            group_id = str(state.get("group_id", ""))
+            if not group_id or group_id in self.sessions or not self.owns(group_id):
+                continue
+            session = self.sessions.create(group_id)
+            try:
+                resumed = await session.resume(state, events)
+            except Exception as e:
+                logger.error(f"[挂科狼人杀] 恢复群 {group_id} 的游戏失败: {e}", exc_info=True)
+                resumed = False
+            if resumed:
+                logger.info(f"[挂科狼人杀] 已恢复群 {group_id} 的游戏（{session.game_phase.value}）")
+            else:
+                self.sessions.remove(group_id, session)
+
+    def _build_router(self, names: Optional[Tuple[str, ...]] = None) -> CommandRouter:
+        """按指令表构建路由表，names 为 None 时包含全部指令"""
+        router = CommandRouter()
+        for name, aliases, handler, exact, needs_arg in self.COMMANDS:
+            if names is None or name in names:
+                router.add(name, aliases, getattr(self, handler), exact=exact, needs_arg=needs_arg)
+        return router
+
+    def _schedule_metrics_dump(self):
+        """metrics_interval 秒后写一次指标文件，然后继续排下一次"""
+        self._metrics_timer = self.deadlines.call_later(self.metrics_interval, self._dump_metrics)
+
+    def _dump_metrics(self):
+        async def write():
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, REGISTRY.write, self.metrics_path)
+            except OSError as e:
+                logger.error(f"[挂科狼人杀] 写入指标文件失败: {e}")
+
+        asyncio.create_task(write())
+        self._schedule_metrics_dump()
+
+    def accepts(self, group_id: str, sender_id: str, text: str) -> bool:
+        """构造 IncomingMessage 之前的快速预检：有房间的群、已在房间中的玩家的私聊，
+        以及看起来像指令的消息才需要处理，其余群聊消息直接丢弃"""
+        if group_id:
+            if group_id in self.sessions:
+                return True
+        elif self.sessions.find_by_user(sender_id) is not None:
+            return True
+        return text.startswith(self.COMMAND_PREFIXES)
+
+    async def handle(self, message: IncomingMessage):
+        """处理一条消息"""
+        # 先按群号/发送者查房间，没有房间的群只识别发起报名指令，其余消息直接丢弃
+        if message.group_id:
+            session = self.sessions.get(message.group_id)
+        else:
+            session = self.sessions.find_by_user(message.sender_id)
+
+        text = message.text
+        # 重复投递的事件只在匹配到指令后按消息 id 丢弃，普通聊天不占用去重表
+        if session is None:
+            if message.group_id and text in self.START_COMMANDS:
+                if self.recent_ids.seen(message.message_id):
+                    return
+                self.router.counts["发起报名"] += 1
+                if not await self.lifecycle.reserve():
+                    await self._reply(message, "❌ 同时进行的游戏太多，请等其他群的游戏结束后再发起")
+                    return
+                session = self.sessions.create(message.group_id)
+                await session.start_registration(message.sender_id)
+            else:
+                matched = self.lobby_router.match(text)
+                if matched is None or self.recent_ids.seen(message.message_id):
+                    return
+                if self.lobby_flood.allow(message.sender_id, text):
+                    await self.lobby_router.invoke(matched, None, message, message.sender_id)
+            return
+
+        # 连发的重复指令和超频指令直接丢弃，不回复
+        matched = self.router.match(text)
+        if matched is None or self.recent_ids.seen(message.message_id):
+            return
+        if not session.flood.allow(message.sender_id, text):
+            return
+        self.sessions.touch(session)
+        await self.router.invoke(matched, session, message, message.sender_id)
+
+    async def _cmd_open(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        await session.start_registration(user_id)
+
+    async def _cmd_register(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        user_name = message.sender_name or f"用户{user_id}"
+        await session.register_player(user_id, user_name)
+
+    async def _cmd_start(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        if user_id == session.game_master or session.game_master is None:
+            await session.request_start()
+        else:
+            await session._send_private_message(user_id, "❌ 只有主持人可以开始游戏")
+
+    async def _cmd_vote(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        await session.handle_vote(user_id, arg)
+
+    async def _cmd_speech(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        await session.handle_speech(user_id, arg)
+
+    async def _cmd_night_action(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        await session.handle_night_action(user_id, arg)
+
+    async def _cmd_take(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        await session.handle_take(user_id, arg)
+
+    async def _cmd_settings(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        # /设置 夜晚 90
+        parts = arg.split()
+        if user_id == session.game_master and len(parts) == 2 and parts[1].isdigit():
+            await session.update_timeout(parts[0], int(parts[1]))
+
+    async def _cmd_rules(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        await session._send_group_message(self.get_game_rules())
+
+    async def _cmd_status(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        await session.show_game_status()
+
+    async def _cmd_cancel(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        if user_id == session.game_master:
+            await session._send_group_message("游戏已取消")
+            session.reset_game()
+
+    async def _reply(self, message: IncomingMessage, content: str):
+        """回复到消息来源（群聊或私聊）"""
+        try:
+            if message.group_id:
+                await self.messenger.send_group(message.group_id, content)
+            else:
+                await self.messenger.send_private(message.sender_id, content)
+        except Exception as e:
+            logger.error(f"[挂科狼人杀] 回复消息失败: {e}")
+
+    async def _cmd_my_stats(self, session: Optional[GameSession], message: IncomingMessage, user_id: str, arg: str):
+        if self.stats is None:
+            return
+        stats = await self.stats.user_stats(user_id)
+        if not stats.games:
+            await self._reply(message, "📊 你还没有完成过挂科狼人杀对局")
+            return
+
+        content = (
+            f"📊 {stats.user_name} 的战绩\n"
+            f"🎮 总场次：{stats.games}　🏆 胜场：{stats.wins}　胜率：{stats.win_rate:.1%}\n"
+        )
+        for camp, (games, wins) in stats.by_camp.items():
+            content += f"  {camp}：{games}场{wins}胜\n"
+        roles = "、".join(f"{role}{games}场{wins}胜" for role, games, wins in stats.by_role[:5])
+        content += f"🎭 角色：{roles}"
+        await self._reply(message, content)
+
+    async def _cmd_rank(self, session: Optional[GameSession], message: IncomingMessage, user_id: str, arg: str):
+        if self.stats is None or not message.group_id:
+            return
+        entries = await self.stats.leaderboard(message.group_id)
+        if not entries:
+            await self._reply(message, f"🏆 本群还没有玩家完成{StatsStore.RANK_MIN_GAMES}场对局，暂无排行榜")
+            return
+
+        content = f"🏆 本群挂科狼人杀排行榜（至少{StatsStore.RANK_MIN_GAMES}场）\n"
+        for rank, entry in enumerate(entries, 1):
+            content += f"{rank}. {entry.user_name}　{entry.wins}胜/{entry.games}场　{entry.win_rate:.1%}\n"
+        await self._reply(message, content.rstrip("\n"))
+
+    async def _cmd_metrics(self, session: Optional[GameSession], message: IncomingMessage, user_id: str, arg: str):
+        """以 Prometheus 文本格式回复当前指标"""
+        await self._reply(message, REGISTRY.render().rstrip("\n"))
+
+    async def _cmd_trace(self, session: GameSession, message: IncomingMessage, user_id: str, arg: str):
+        """主持人导出本局目前为止的追踪"""
+        if user_id != session.game_master:
+            return
+        path = await session.export_trace()
+        if path is None:
+            await session._send_group_message("❌ 未开启追踪（配置 enable_tracing）")
+        else:
+            await session._send_group_message(f"📈 追踪已导出：{path}")
+
+    async def _cmd_rooms(self, session: Optional[GameSession], message: IncomingMessage, user_id: str, arg: str):
+        """房间数与内存占用最多的几个房间"""
+        total, rows = self.lifecycle.report(5)
+        content = f"🏠 当前房间：{len(self.sessions)}个，状态共约{total / 1024:.1f}KB"
+        for room, size, idle in rows:
+            content += (
+                f"\n  群{room.group_id}　{room.game_phase.value}　{len(room.players)}人"
+                f"　{size / 1024:.1f}KB　{int(idle)}秒无活动"
+            )
+        await self._reply(message, content)
+
+    async def terminate(self):
+        """把所有房间未落盘的日志写入磁盘，再停止定时器"""
+        self.lifecycle.stop()
+        for session in self.sessions.sessions():
+            if session.journal is not None:
+                await session.journal.commit()
+        for session in self.sessions.sessions():
+            session.scheduler.cancel()
+        if self._metrics_timer is not None:
+            self.deadlines.cancel(self._metrics_timer)
+        self.deadlines.close()
+        if self.stats is not None:
+            self.stats.close()
+
+    @staticmethod
+    def get_game_rules() -> str:
+        """获取游戏规则"""
+        return (
+            "🎮 【挂科版狼人杀】游戏规则\n\n"
+            "🎯 游戏目标：\n"
+            "  🔴 挂科阵营：让所有学生挂科\n"
+            "  🎓 学生阵营：找出并淘汰所有挂科生\n\n"
+            "🌙 夜晚行动顺序：\n"
+            "  0. 交换生（仅第一晚，可选）\n"
+            "  1. 作弊者（可选）\n"
+            "  2. 挂科生、学业预警\n"
+            "  3. 教务处\n"
+            "  4. 奖学金\n"
+            "  5. 图书馆管理员\n"
+            "  6. 任课老师\n\n"
+            "☀️ 白天流程：\n"
+            "  1. 公布昨晚结果\n"
+            "  2. 讨论发言\n"
+            "  3. 投票淘汰\n\n"
+            "💡 特殊角色说明详见私聊"
+        )
@@ -0,0 +1,358 @@
+"""角色配置平衡性分析
+
+用 NumPy 在“对局”维度上向量化蒙特卡洛模拟：一次推进成千上万局的同一阶段，
+对每个人数和每种角色开关组合给出两个阵营的胜率及 95% 置信区间。
+
+    python -m werewolf.balance --games 200000
+    python -m werewolf.balance --games 1000000 --min-players 8 --max-players 8 --all-combinations
+
+模拟的规则与 GameEngine 当前实现、simulate.RandomAgent 的随机策略一致：
+挂科生每晚随机挂科一名非挂科阵营玩家，奖学金随机保护一人（不能连续两晚同一人），
+任课老师随机救人（平时成绩只能用一次），学生会主席第一次被挂科只失去一颗学分，
+助教出局时随机带走一名玩家，白天所有存活玩家随机投票，平票无人出局。
+查验、干扰、禁言不影响随机策略下的结果，交换生在随机策略下只给出一个名字、
+不会连接情侣，这些角色只影响阵营人数，因此阵营组成相同的配置只模拟一次。
+"""
+import time
+import random
+import argparse
+import itertools
+from math import sqrt
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖，只有平衡性分析需要
+    np = None
+
+from .models import Role, WEREWOLF_ROLES
+from .roles import generate_roles
+from .settings import GameSettings
+
+# 超过这个天数仍未分出胜负则记为平局（与 simulate.MAX_DAYS 一致）
+MAX_DAYS = 50
+
+# 可开关的角色（roles 配置键 -> 角色）
+ROLE_TOGGLES: Dict[str, Role] = {
+    "academic_affairs": Role.ACADEMIC_AFFAIRS,
+    "teacher": Role.TEACHER,
+    "scholarship": Role.SCHOLARSHIP,
+    "teaching_assistant": Role.TEACHING_ASSISTANT,
+    "exchange_student": Role.EXCHANGE_STUDENT,
+    "repeater": Role.REPEATER,
+    "academic_warning": Role.ACADEMIC_WARNING,
+    "librarian": Role.LIBRARIAN,
+    "student_union": Role.STUDENT_UNION,
+    "cheater": Role.CHEATER,
+}
+
+# 对局结果编码
+_PLAYING, _STUDENT_WIN, _WEREWOLF_WIN, _DRAW = 0, 1, 2, 3
+
+
+@dataclass
+class Outcome:
+    """一种阵营组成的模拟结果"""
+    games: int
+    student_wins: int
+    werewolf_wins: int
+    draws: int
+    total_days: int
+
+    @property
+    def avg_days(self) -> float:
+        return self.total_days / self.games if self.games else 0.0
+
+    def student_rate(self) -> Tuple[float, float, float]:
+        """学生阵营胜率及 95% 置信区间"""
+        return wilson_interval(self.student_wins, self.games)
+
+    def werewolf_rate(self) -> Tuple[float, float, float]:
+        """挂科阵营胜率及 95% 置信区间"""
+        return wilson_interval(self.werewolf_wins, self.games)
+
+
+@dataclass
+class BalanceRow:
+    """分析表中的一行"""
+    player_count: int
+    label: str  # 相对当前配置的改动，如 "+交换生"、"-助教"
+    roles_config: Dict[str, int]
+    outcome: Optional[Outcome]  # 角色数超过人数时为 None
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("平衡性分析需要 numpy，请先执行 pip install numpy")
+
+
+def wilson_interval(wins: int, games: int, z: float = 1.96) -> Tuple[float, float, float]:
+    """胜率的 Wilson 置信区间，返回 (胜率, 下限, 上限)"""
+    if games == 0:
+        return 0.0, 0.0, 0.0
+    p = wins / games
+    denom = 1 + z * z / games
+    center = (p + z * z / (2 * games)) / denom
+    margin = z * sqrt(p * (1 - p) / games + z * z / (4 * games * games)) / denom
+    return p, max(0.0, center - margin), min(1.0, center + margin)
+
+
+CompositionKey = Tuple[int, int, int, bool, bool, bool, bool]
+
+
+def composition_key(roles: List[Role]) -> CompositionKey:
+    """影响模拟结果的阵营组成：(人数, 挂科生, 其他挂科阵营角色, 有任课老师, 有助教, 有奖学金, 有学生会主席)"""
+    counts = Counter(roles)
+    killers = counts[Role.BAD_STUDENT]
+    other_wolves = sum(counts[r] for r in WEREWOLF_ROLES) - killers
+    return (
+        len(roles),
+        killers,
+        other_wolves,
+        counts[Role.TEACHER] > 0,
+        counts[Role.TEACHING_ASSISTANT] > 0,
+        counts[Role.SCHOLARSHIP] > 0,
+        counts[Role.STUDENT_UNION] > 0,
+    )
+
+
+def _pick(mask, rng):
+    """每局在 mask 为真的座位中等概率选一个，返回 (座位, 是否有候选)"""
+    keys = rng.random(mask.shape, dtype=np.float32)
+    keys[~mask] = -1.0
+    return keys.argmax(axis=1), mask.any(axis=1)
+
+
+def _take_down(alive, shooters, rng):
+    """助教出局后随机带走一名存活玩家"""
+    rows = np.flatnonzero(shooters)
+    if rows.size:
+        target, has = _pick(alive[rows], rng)
+        alive[rows[has], target[has]] = False
+
+
+def _check_winner(alive, is_wolf, result, rows):
+    """与 GameEngine.check_winner 相同的判定顺序：先判学生阵营，再判挂科阵营"""
+    wolves = (alive & is_wolf).any(axis=1)
+    students = (alive & ~is_wolf).any(axis=1)
+    result[rows[~wolves]] = _STUDENT_WIN
+    result[rows[wolves & ~students]] = _WEREWOLF_WIN
+    return wolves & students
+
+
+def _simulate_chunk(key: CompositionKey, games: int, rng) -> Outcome:
+    n, killers, other_wolves, has_teacher, has_ta, has_guard, has_union = key
+    # 座位顺序不影响随机策略下的结果，固定排布：挂科生、其他挂科阵营、任课老师、助教、奖学金、学生会主席、学生
+    is_killer = np.zeros(n, dtype=bool)
+    is_killer[:killers] = True
+    is_wolf = np.zeros(n, dtype=bool)
+    is_wolf[:killers + other_wolves] = True
+    seat = killers + other_wolves
+    teacher = seat if has_teacher else -1
+    seat += has_teacher
+    ta = seat if has_ta else -1
+    seat += has_ta
+    guard = seat if has_guard else -1
+    seat += has_guard
+    union = seat if has_union else -1
+
+    alive = np.ones((games, n), dtype=bool)
+    ids = np.arange(games)  # 仍在进行的对局编号
+    result = np.zeros(games, dtype=np.int8)
+    days = np.zeros(games, dtype=np.int32)
+    save_left = np.full(games, has_teacher)  # 平时成绩是否还在
+    last_protected = np.full(games, -1)  # 奖学金上一晚保护的座位
+    union_hit = np.zeros(games, dtype=bool)  # 学生会主席是否已失去一颗学分
+
+    for day in range(1, MAX_DAYS + 1):
+        days[ids] = day
+
+        # ---- 夜晚 ----
+        candidates = alive & ~is_wolf
+        victim, has_victim = _pick(candidates, rng)
+        has_victim &= (alive & is_killer).any(axis=1)
+        protected = np.full(alive.shape[0], -1)
+        if guard >= 0:
+            # 奖学金在存活玩家中随机保护一人，与上一晚相同则保护无效
+            guarded, _ = _pick(alive, rng)
+            valid = alive[:, guard] & (guarded != last_protected)
+            protected[valid] = guarded[valid]
+            last_protected = protected
+            has_victim &= victim != protected
+        if teacher >= 0:
+            # 任课老师在存活玩家中随机救一人，救中当晚的目标即抵消挂科并用掉平时成绩
+            saved, _ = _pick(alive, rng)
+            rescued = has_victim & save_left & alive[:, teacher] & (saved == victim)
+            save_left &= ~rescued
+            has_victim &= ~rescued
+        if union >= 0:
+            # 学生会主席第一次被挂科只失去一颗学分
+            shielded = has_victim & (victim == union) & ~union_hit
+            union_hit |= shielded
+            has_victim &= ~shielded
+        rows = np.flatnonzero(has_victim)
+        alive[rows, victim[rows]] = False
+        if ta >= 0:
+            _take_down(alive, has_victim & (victim == ta), rng)
+
+        playing = _check_winner(alive, is_wolf, result, ids)
+        alive, ids = alive[playing], ids[playing]
+        save_left, last_protected, union_hit = save_left[playing], last_protected[playing], union_hit[playing]
+        if not ids.size:
+            break
+
+        # ---- 白天投票：每名存活玩家在其他存活玩家中随机投一票 ----
+        count = alive.sum(axis=1)
+        rank = np.cumsum(alive, axis=1) - 1  # 存活玩家在存活者中的序号
+        order = np.argsort(~alive, axis=1, kind="stable")  # 存活玩家的座位排在前面
+        pick = (rng.random(alive.shape) * (count[:, None] - 1)).astype(np.int64)
+        pick += pick >= rank
+        voting = alive & (count[:, None] > 1)
+        target = np.take_along_axis(order, pick, axis=1)
+
+        games_now = alive.shape[0]
+        flat = (np.arange(games_now)[:, None] * n + target)[voting]
+        votes = np.bincount(flat, minlength=games_now * n).reshape(games_now, n)
+        top = votes.max(axis=1)
+        lynched = votes.argmax(axis=1)
+        has_lynch = (top > 0) & ((votes == top[:, None]).sum(axis=1) == 1)
+        rows = np.flatnonzero(has_lynch)
+        alive[rows, lynched[rows]] = False
+        if ta >= 0:
+            _take_down(alive, has_lynch & (lynched == ta), rng)
+
+        playing = _check_winner(alive, is_wolf, result, ids)
+        alive, ids = alive[playing], ids[playing]
+        save_left, last_protected, union_hit = save_left[playing], last_protected[playing], union_hit[playing]
+        if not ids.size:
+            break
+
+    result[ids] = _DRAW
+    return Outcome(
+        games=games,
+        student_wins=int((result == _STUDENT_WIN).sum()),
+        werewolf_wins=int((result == _WEREWOLF_WIN).sum()),
+        draws=int((result == _DRAW).sum()),
+        total_days=int(days.sum()),
+    )
+
+
+def simulate_composition(roles: List[Role], games: int, seed: Optional[int] = None, chunk: int = 200000) -> Outcome:
+    """模拟一种角色组成 games 局，分块进行以控制内存"""
+    _require_numpy()
+    key = composition_key(roles)
+    rng = np.random.default_rng(seed)
+    total = Outcome(0, 0, 0, 0, 0)
+    remaining = games
+    while remaining > 0:
+        size = min(chunk, remaining)
+        part = _simulate_chunk(key, size, rng)
+        total.games += part.games
+        total.student_wins += part.student_wins
+        total.werewolf_wins += part.werewolf_wins
+        total.draws += part.draws
+        total.total_days += part.total_days
+        remaining -= size
+    return total
+
+
+def role_variants(roles_config: Dict[str, int], all_combinations: bool = False) -> List[Tuple[str, Dict[str, int]]]:
+    """当前配置及其角色开关变体，返回 [(标签, 配置)]
+
+    默认只翻转单个开关；all_combinations 为真时枚举全部开关组合。
+    """
+    variants = [("当前配置", dict(roles_config))]
+    keys = list(ROLE_TOGGLES)
+    if all_combinations:
+        for flags in itertools.product((0, 1), repeat=len(keys)):
+            config = dict(roles_config)
+            config.update(zip(keys, flags))
+            if config == roles_config:
+                continue
+            label = "+".join(ROLE_TOGGLES[k].value for k, f in zip(keys, flags) if f) or "无特殊角色"
+            variants.append((label, config))
+        return variants
+
+    for key in keys:
+        config = dict(roles_config)
+        enabled = bool(config.get(key, 0))
+        config[key] = 0 if enabled else 1
+        variants.append((f"{'-' if enabled else '+'}{ROLE_TOGGLES[key].value}", config))
+    return variants
+
+
+def analyze(
+    settings: GameSettings,
+    games: int = 100000,
+    seed: int = 0,
+    min_players: Optional[int] = None,
+    max_players: Optional[int] = None,
+    all_combinations: bool = False,
+) -> List[BalanceRow]:
+    """对 min_players..max_players 的每个人数、每个角色变体给出模拟结果"""
+    _require_numpy()
+    low = min_players or settings.min_players
+    high = max_players or settings.max_players
+    cache: Dict[CompositionKey, Outcome] = {}
+    rows = []
+    for player_count in range(low, high + 1):
+        for label, config in role_variants(settings.roles_config, all_combinations):
+            # generate_roles 只用于得到角色组成，洗牌结果不影响
+            roles = generate_roles(player_count, config, random.Random(0))
+            if len(roles) != player_count:
+                rows.append(BalanceRow(player_count, label, config, None))
+                continue
+            key = composition_key(roles)
+            if key not in cache:
+                cache[key] = simulate_composition(roles, games, seed + len(cache))
+            rows.append(BalanceRow(player_count, label, config, cache[key]))
+    return rows
+
+
+def format_table(rows: List[BalanceRow]) -> str:
+    """把分析结果排成文本表格"""
+    lines = [f"{'人数':<4}{'配置':<20}{'学生阵营胜率 (95%CI)':<28}{'挂科阵营胜率 (95%CI)':<28}{'平局':>7}{'平均天数':>8}"]
+    for row in rows:
+        if row.outcome is None:
+            lines.append(f"{row.player_count:<6}{row.label:<20}角色数超过人数，无法开局")
+            continue
+        out = row.outcome
+        cells = []
+        for rate, low, high in (out.student_rate(), out.werewolf_rate()):
+            cells.append(f"{rate:6.1%} [{low:.1%}, {high:.1%}]")
+        lines.append(
+            f"{row.player_count:<6}{row.label:<20}{cells[0]:<30}{cells[1]:<30}"
+            f"{out.draws / out.games:>7.1%}{out.avg_days:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="挂科狼人杀角色配置平衡性分析")
+    parser.add_argument("--games", type=int, default=200000, help="每种阵营组成模拟的局数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--min-players", type=int, default=None, help="最少人数（默认取配置）")
+    parser.add_argument("--max-players", type=int, default=None, help="最多人数（默认取配置）")
+    parser.add_argument("--all-combinations", action="store_true", help="枚举全部角色开关组合")
+    args = parser.parse_args(argv)
+
+    _require_numpy()
+    started = time.perf_counter()
+    rows = analyze(
+        GameSettings(),
+        games=args.games,
+        seed=args.seed,
+        min_players=args.min_players,
+        max_players=args.max_players,
+        all_combinations=args.all_combinations,
+    )
+    elapsed = time.perf_counter() - started
+    print(format_table(rows))
+    simulated = len({id(r.outcome) for r in rows if r.outcome is not None})
+    print(f"\n共模拟{simulated}种阵营组成，每种{args.games}局，用时{elapsed:.1f}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+
+from .metrics import SEND_FAILURES, SEND_QUEUE_SECONDS, SEND_SECONDS
+from .tracing import span
+
+logger = logging.getLogger("astrbot")
+
+
+class TokenBucket:
+    """令牌桶限速器，rate 为每秒补充的令牌数，rate <= 0 表示不限速"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """取走一个令牌，没有令牌时等待"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class DeliveryResult:
+    """单个收件人的投递结果"""
+    user_id: str
+    ok: bool
+    attempts: int = 0
+    error: Optional[str] = None
+
+
+class FanoutMessenger:
+    """在底层 messenger 外加并发上限、令牌桶限速和失败重试
+
+    inner 需提供 send_private / send_group 协程方法。群聊与私聊共用同一个
+    令牌桶，对应平台对单个账号的整体发送频率限制。
+    """
+
+    def __init__(
+        self,
+        inner,
+        concurrency: int = 5,
+        rate: float = 10.0,
+        burst: int = 10,
+        retries: int = 1,
+        retry_delay: float = 1.0,
+    ):
+        self.inner = inner
+        self.retries = max(0, retries)
+        self.retry_delay = retry_delay
+        self.bucket = TokenBucket(rate, burst)
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def send_private(self, user_id: str, content: str):
+        """发送单条私聊，失败时抛出异常"""
+        await self._send("private", self.inner.send_private, user_id, content)
+
+    async def send_group(self, group_id: str, content: str):
+        """发送群聊，失败时抛出异常"""
+        await self._send("group", self.inner.send_group, group_id, content)
+
+    async def _send(self, kind: str, send, target: str, content: str):
+        with span(f"send_{kind}", target=target, length=len(content)):
+            await self._send_limited(kind, send, target, content)
+
+    async def _send_limited(self, kind: str, send, target: str, content: str):
+        queued = time.perf_counter()
+        async with self._semaphore:
+            await self.bucket.acquire()
+            started = time.perf_counter()
+            SEND_QUEUE_SECONDS.observe(started - queued, kind)
+            try:
+                await send(target, content)
+            except Exception:
+                SEND_FAILURES.inc(kind)
+                raise
+            finally:
+                SEND_SECONDS.observe(time.perf_counter() - started, kind)
+
+    async def _deliver(self, user_id: str, content: str) -> DeliveryResult:
+        result = DeliveryResult(user_id=user_id, ok=False)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                # 重试前先让出并发名额，不阻塞其他收件人
+                await asyncio.sleep(self.retry_delay * attempt)
+            result.attempts = attempt + 1
+            try:
+                await self.send_private(user_id, content)
+            except Exception as e:
+                result.error = str(e)
+                continue
+            result.ok = True
+            result.error = None
+            break
+        return result
+
+    async def send_private_many(self, messages: List[Tuple[str, str]]) -> Dict[str, DeliveryResult]:
+        """并发发送多条私聊，返回每个收件人的投递结果"""
+        if not messages:
+            return {}
+        results = await asyncio.gather(
+            *(self._deliver(user_id, content) for user_id, content in messages)
+        )
+        return {r.user_id: r for r in results}
@@ -0,0 +1,439 @@
+import random
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from dataclasses import dataclass, field
+
+from .index import PlayerIndex
+from .models import Camp, DeathCause, GamePhase, Player, PlayerStatus, Role, RuleError, WEREWOLF_ROLES
+from .night import FIRST_NIGHT_ONLY, NightAction, NightResult, NightState, build_pipeline, parse_night_action, resolve_night
+from .roles import ROLE_NIGHT_ACTIONS, generate_roles
+from .settings import GameSettings
+from .tally import VoteTally
+
+
+@dataclass
+class VoteResult:
+    """投票结算结果"""
+    lynched: Optional[Player] = None  # 被投票淘汰的玩家
+    tied: List[Player] = field(default_factory=list)  # 平票的玩家
+
+
+@dataclass
+class Death:
+    """一次出局"""
+    player: Player
+    cause: DeathCause
+
+
+class GameEngine:
+    """挂科狼人杀规则引擎
+
+    纯同步、无网络、无等待，所有随机性来自 rng，给定种子即可完整复现一局。
+    插件里的 GameSession 只负责把引擎的结果渲染成消息并安排阶段定时器，
+    simulate 模块则直接驱动引擎批量对局。
+
+    设置 recorder 后，每次状态变化都会以事件字典的形式交给它（用于写日志），
+    snapshot()/restore() 与 apply() 可以从快照加事件重建出同样的状态。
+    """
+
+    def __init__(self, settings: GameSettings, rng: Optional[random.Random] = None):
+        self.settings = settings
+        self.rng = rng or random.Random()
+
+        self.phase = GamePhase.WAITING
+        self.resolving = False  # 本阶段已结算、正在处理出局（如等待助教选择），不再接受行动和投票
+        self.index = PlayerIndex()  # 玩家索引（名称/角色/存活/阵营计数）
+        self.player_order: List[str] = []  # 座位顺序
+        self.day_count = 0  # 当前天数
+        self.night_actions: Dict[str, NightAction] = {}  # 夜晚行动记录（提交时已解析）
+        self.night_actors: Set[str] = set()  # 本晚需要行动的玩家
+        self.night_state = NightState()  # 跨夜晚的技能状态（药水、连续保护/禁言限制、学分）
+        self.night_pipeline = build_pipeline(set())  # 本局的夜晚结算表
+        self.tally = VoteTally()  # 投票记录（增量计票）
+        self.pending_shooters: List[Player] = []  # 等待发动带走技能的助教
+        self.winner: Optional[Camp] = None
+        self.recorder: Optional[Callable[[Dict[str, Any]], None]] = None  # 状态变化事件的接收者
+
+    def _emit(self, op: str, **data):
+        """记录一次状态变化（参数需要额外构造的事件由调用方先判断 recorder，模拟对局时省去这部分开销）"""
+        if self.recorder is not None:
+            data["op"] = op
+            self.recorder(data)
+
+    @property
+    def players(self) -> Dict[str, Player]:
+        return self.index.players
+
+    def reset(self):
+        """清空整局状态"""
+        self.phase = GamePhase.WAITING
+        self.resolving = False
+        self.index.clear()
+        self.player_order.clear()
+        self.day_count = 0
+        self.night_actions.clear()
+        self.night_actors.clear()
+        self.night_state = NightState()
+        self.night_pipeline = build_pipeline(set())
+        self.tally.clear()
+        self.pending_shooters.clear()
+        self.winner = None
+
+    # ---------- 报名 ----------
+
+    def open_registration(self):
+        """开始报名"""
+        if self.phase != GamePhase.WAITING:
+            raise RuleError("游戏正在进行中，无法开始新游戏")
+        self.phase = GamePhase.REGISTERING
+        self._emit("open")
+
+    def check_registration(self, user_id: str, user_name: str):
+        """检查玩家能否报名，不能时抛出 RuleError"""
+        if self.phase != GamePhase.REGISTERING:
+            raise RuleError("当前不在报名阶段")
+        if user_id in self.index:
+            raise RuleError("你已经报名过了")
+        if len(self.index) >= self.settings.max_players:
+            raise RuleError("报名人数已满")
+        if self.index.name_taken(user_name):
+            raise RuleError(f"已有玩家使用昵称 {user_name}，请修改群名片后再报名")
+
+    def add_player(self, user_id: str, user_name: str, group_id: Optional[str] = None) -> Player:
+        """玩家报名"""
+        self.check_registration(user_id, user_name)
+        player = Player(user_id=user_id, user_name=user_name, group_id=group_id)
+        self.index.add(player)
+        self._emit("join", uid=user_id, name=user_name, group=group_id)
+        return player
+
+    @property
+    def registered_count(self) -> int:
+        return len(self.index)
+
+    @property
+    def registration_full(self) -> bool:
+        return len(self.index) >= self.settings.max_players
+
+    def start_game(self, roles: Optional[List[Role]] = None) -> List[Player]:
+        """分配座位和角色，返回按座位排列的玩家"""
+        if self.phase != GamePhase.REGISTERING:
+            raise RuleError("当前不在报名阶段")
+        if len(self.index) < self.settings.min_players:
+            raise RuleError(f"报名人数不足{self.settings.min_players}人，无法开始游戏")
+
+        order = list(self.index.players)
+        if roles is None:
+            roles = generate_roles(len(order), self.settings.roles_config, self.rng)
+        self.rng.shuffle(order)
+        roles = roles[:len(order)]
+        self._emit("deal", order=order, roles=[role.name for role in roles])
+        return self._deal(order, roles)
+
+    def _deal(self, order: List[str], roles: List[Role]) -> List[Player]:
+        """按座位顺序发放角色"""
+        self.day_count = 0
+        self.player_order = order
+        self.index.reseat(order)
+        seated = []
+        for player, role in zip(self.index.seats, roles):
+            self.index.set_role(player, role)
+            if role == Role.STUDENT_UNION:
+                self.night_state.credits[player.user_id] = 2
+            seated.append(player)
+
+        self.night_pipeline = build_pipeline(set(roles))
+        self.phase = GamePhase.NIGHT
+        return seated
+
+    def teammates(self, player: Player) -> List[Player]:
+        """挂科阵营队友（挂科生不知道作弊者的身份）"""
+        if player.role not in WEREWOLF_ROLES:
+            return []
+        return [
+            p
+            for p in self.index.in_camp(Camp.WEREWOLF)
+            if p is not player and (player.role == Role.CHEATER or p.role != Role.CHEATER)
+        ]
+
+    # ---------- 夜晚 ----------
+
+    def begin_night(self) -> List[Player]:
+        """进入夜晚，返回今晚需要行动的玩家"""
+        self.phase = GamePhase.NIGHT
+        self.resolving = False
+        self.day_count += 1
+        self.night_actions.clear()
+        self.night_actors.clear()
+        self.night_state.silenced = None
+        self._emit("night", day=self.day_count)
+
+        # 重置保护状态
+        for player in self.index.players.values():
+            player.is_protected = False
+
+        actors = []
+        for player in self.index.alive_players():
+            if player.role in ROLE_NIGHT_ACTIONS:
+                if player.role in FIRST_NIGHT_ONLY and self.day_count > 1:
+                    continue
+                self.night_actors.add(player.user_id)
+                actors.append(player)
+        return actors
+
+    def submit_night_action(self, user_id: str, action: str) -> Tuple[NightAction, bool]:
+        """校验并记录夜晚行动，返回 (解析后的行动, 是否所有需要行动的玩家都已行动)
+
+        行动不合法时抛出 RuleError，玩家可以重新提交；重复提交以最后一次为准。
+        """
+        if self.phase != GamePhase.NIGHT:
+            raise RuleError("现在不是夜晚行动时间")
+        if self.resolving:
+            raise RuleError("今晚的行动已经结算，请等待天亮")
+        if not self.index.is_alive(user_id):
+            raise RuleError("你已出局，不能行动")
+        parsed = parse_night_action(self, self.index.players[user_id], action)
+        self.night_actions[user_id] = parsed
+        if self.recorder is not None:
+            self._emit("act", uid=user_id, **parsed.to_dict())
+        return parsed, self.night_actions_complete
+
+    @property
+    def night_actions_complete(self) -> bool:
+        return bool(self.night_actors) and self.night_actors.issubset(self.night_actions)
+
+    def resolve_night(self) -> NightResult:
+        """按本局的结算表结算夜晚行动"""
+        self.resolving = True
+        result = resolve_night(self)
+        if self.recorder is not None:
+            self._emit("night_state", state=self.night_state.to_dict())
+        return result
+
+    def record_link(self, first: str, second: str):
+        """记录交换生连接的情侣"""
+        self._emit("link", uids=[first, second])
+
+    # ---------- 白天与投票 ----------
+
+    def begin_day(self):
+        """进入白天"""
+        self.phase = GamePhase.DAY
+        self.resolving = False
+        self._emit("day")
+
+    def check_speaker(self, user_id: str) -> Player:
+        """检查玩家能否发言"""
+        if self.phase != GamePhase.DAY:
+            raise RuleError("现在不是发言时间")
+        if not self.index.is_alive(user_id):
+            raise RuleError("你已出局，不能发言")
+        if user_id == self.night_state.silenced:
+            raise RuleError("你被图书馆管理员禁言了，今天不能发言")
+        return self.index.players[user_id]
+
+    def begin_vote(self):
+        """进入投票"""
+        self.phase = GamePhase.VOTING
+        self.resolving = False
+        self.tally.clear()
+        self._emit("vote_open")
+
+    def cast_vote(self, voter_id: str, target_name: str) -> Tuple[Player, Optional[Player], bool]:
+        """记录投票，返回 (目标, 改票前的目标, 投票是否已可结束)"""
+        if self.phase != GamePhase.VOTING:
+            raise RuleError("现在不是投票时间")
+        if self.resolving:
+            raise RuleError("投票已经结束，正在结算")
+        if not self.index.is_alive(voter_id):
+            raise RuleError("你已出局，不能投票")
+
+        target = self.index.resolve(target_name)
+        if not target or not self.index.player_alive(target):
+            raise RuleError(f"找不到玩家 {target_name} 或该玩家已出局")
+        if target.user_id == voter_id:
+            raise RuleError("不能投票给自己")
+        if self.tally.has_voted(voter_id) and not self.settings.allow_revote:
+            raise RuleError("你已经投过票了，本局不允许改票")
+
+        previous_id = self.tally.cast(voter_id, target.user_id)
+        self._emit("vote", voter=voter_id, target=target.user_id)
+        previous = self.index.players[previous_id] if previous_id and previous_id != target.user_id else None
+        return target, previous, self.vote_decided
+
+    @property
+    def vote_decided(self) -> bool:
+        """剩余选票已无法改变结果"""
+        return self.tally.is_decided(self.index.alive_count, self.settings.allow_revote)
+
+    def resolve_votes(self) -> VoteResult:
+        """结算投票，之后直到下一阶段开始都不再接受投票"""
+        self.resolving = True
+        candidates = self.tally.leaders()
+        if len(candidates) == 1:
+            return VoteResult(lynched=self.index.players[candidates[0]])
+        # 平票，无人被淘汰（按座位顺序列出）
+        tied = set(candidates)
+        return VoteResult(tied=[self.index.players[p] for p in self.player_order if p in tied])
+
+    # ---------- 出局与胜负 ----------
+
+    def eliminate(self, player: Player, cause: DeathCause) -> List[Death]:
+        """淘汰玩家并结算情侣殉情，返回本次出局记录
+
+        可以发动技能的助教会进入 pending_shooters，由调用方取得助教的选择后
+        调用 shoot() 继续结算。
+        """
+        deaths = []
+        queue = [(player, cause)]
+        while queue:
+            current, current_cause = queue.pop(0)
+            if not self.index.player_alive(current):
+                continue
+            self.index.set_status(current, PlayerStatus.DROPPED)
+            deaths.append(Death(current, current_cause))
+            if self.recorder is not None:
+                self._emit("out", uid=current.user_id, cause=current_cause.name)
+
+            # 交换生情侣殉情
+            partner = self.index.get(current.partner) if current.partner else None
+            if partner and self.index.player_alive(partner):
+                queue.append((partner, DeathCause.LOVER))
+
+            # 助教被毒时不能发动技能
+            if current.role == Role.TEACHING_ASSISTANT and current_cause != DeathCause.POISON:
+                self.pending_shooters.append(current)
+        return deaths
+
+    def next_shooter(self) -> Optional[Player]:
+        """取出下一个等待发动技能的助教"""
+        return self.pending_shooters.pop(0) if self.pending_shooters else None
+
+    def shoot_candidates(self, shooter: Player) -> List[Player]:
+        """助教可以带走的玩家"""
+        return [p for p in self.index.alive_players() if p.user_id != shooter.user_id]
+
+    def find_shoot_target(self, shooter: Player, target_name: str) -> Player:
+        """按昵称找到助教要带走的玩家，不能带走时抛出 RuleError"""
+        target = self.index.resolve(target_name)
+        if not target or not self.index.player_alive(target):
+            raise RuleError(f"找不到玩家 {target_name} 或该玩家已出局")
+        if target.user_id == shooter.user_id:
+            raise RuleError("不能带走自己")
+        return target
+
+    def shoot(self, shooter: Player, target: Player) -> List[Death]:
+        """助教带走一名玩家"""
+        if not self.index.player_alive(target) or target.user_id == shooter.user_id:
+            raise RuleError(f"不能带走 {target.user_name}")
+        return self.eliminate(target, DeathCause.TAKEN)
+
+    def check_winner(self) -> Optional[Camp]:
+        """检查游戏是否结束，结束时返回获胜阵营"""
+        if not len(self.index):
+            # 对局已被重置（如取消游戏），没有胜负可言
+            return None
+        if not self.index.alive_in_camp(Camp.WEREWOLF):
+            # 学生阵营胜利
+            self.winner = Camp.STUDENT
+        elif not self.index.alive_in_camp(Camp.STUDENT):
+            # 挂科阵营胜利
+            self.winner = Camp.WEREWOLF
+        else:
+            return None
+        self.phase = GamePhase.ENDED
+        self._emit("end", winner=self.winner.name)
+        return self.winner
+
+    # ---------- 快照与重放 ----------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """导出可 JSON 序列化的完整状态"""
+        return {
+            "phase": self.phase.name,
+            "day_count": self.day_count,
+            "players": [
+                {
+                    "uid": p.user_id,
+                    "name": p.user_name,
+                    "group": p.group_id,
+                    "role": p.role.name if p.role else None,
+                    "status": p.status.name,
+                    "partner": p.partner,
+                }
+                for p in self.index.players.values()
+            ],
+            "player_order": list(self.player_order),
+            "night_actions": {uid: action.to_dict() for uid, action in self.night_actions.items()},
+            "night_actors": sorted(self.night_actors),
+            "night_state": self.night_state.to_dict(),
+            "ballots": dict(self.tally.ballots),
+            "winner": self.winner.name if self.winner else None,
+        }
+
+    def restore(self, state: Dict[str, Any]):
+        """从 snapshot() 的结果恢复状态（不产生事件）"""
+        self.reset()
+        for data in state["players"]:
+            player = Player(
+                user_id=data["uid"],
+                user_name=data["name"],
+                group_id=data.get("group"),
+                role=Role[data["role"]] if data.get("role") else None,
+                status=PlayerStatus[data["status"]],
+                partner=data.get("partner"),
+            )
+            self.index.add(player)
+        self.phase = GamePhase[state["phase"]]
+        self.day_count = state["day_count"]
+        self.player_order = list(state["player_order"])
+        if self.player_order:
+            self.index.reseat(self.player_order)
+        self.night_actions.update(
+            (uid, NightAction.from_dict(uid, data)) for uid, data in state["night_actions"].items()
+        )
+        self.night_actors.update(state["night_actors"])
+        if state.get("night_state"):
+            self.night_state = NightState.from_dict(state["night_state"])
+        if self.phase not in (GamePhase.WAITING, GamePhase.REGISTERING):
+            self.night_pipeline = build_pipeline({p.role for p in self.index.players.values() if p.role})
+        for voter, target in state["ballots"].items():
+            self.tally.cast(voter, target)
+        self.winner = Camp[state["winner"]] if state.get("winner") else None
+
+    def apply(self, event: Dict[str, Any]):
+        """重放一条 recorder 记录的事件（不做规则检查，不产生新事件）"""
+        recorder, self.recorder = self.recorder, None
+        try:
+            op = event["op"]
+            if op == "open":
+                self.phase = GamePhase.REGISTERING
+            elif op == "join":
+                self.index.add(Player(user_id=event["uid"], user_name=event["name"], group_id=event.get("group")))
+            elif op == "deal":
+                self._deal(list(event["order"]), [Role[name] for name in event["roles"]])
+            elif op == "night":
+                self.begin_night()
+                self.day_count = event.get("day", self.day_count)
+            elif op == "act":
+                self.night_actions[event["uid"]] = NightAction.from_dict(event["uid"], event)
+            elif op == "link":
+                first, second = (self.index.players[uid] for uid in event["uids"])
+                first.partner, second.partner = second.user_id, first.user_id
+                first.is_exchanged = second.is_exchanged = True
+            elif op == "night_state":
+                self.night_state = NightState.from_dict(event["state"])
+            elif op == "day":
+                self.begin_day()
+            elif op == "vote_open":
+                self.begin_vote()
+            elif op == "vote":
+                self.tally.cast(event["voter"], event["target"])
+            elif op == "out":
+                player = self.index.get(event["uid"])
+                if player is not None:
+                    self.index.set_status(player, PlayerStatus.DROPPED)
+            elif op == "end":
+                self.winner = Camp[event["winner"]]
+                self.phase = GamePhase.ENDED
+        finally:
+            self.recorder = recorder
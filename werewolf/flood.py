@@ -0,0 +1,103 @@
+import time
+from typing import Callable
+from collections import OrderedDict
+
+from .metrics import REGISTRY
+
+EVENTS_DROPPED = REGISTRY.counter(
+    "werewolf_events_dropped_total",
+    "被丢弃的消息（duplicate 为平台重复投递，repeat 为短时间内重复的同一指令，rate 为超出个人频率限制）",
+    ("reason",),
+)
+
+
+class RecentIds:
+    """最近处理过的消息 id（有界，超出容量时淘汰最早的）
+
+    OneBot 适配器断线重连后可能重复投递同一事件，按消息 id 去重。
+    """
+
+    def __init__(self, capacity: int = 2048):
+        self.capacity = max(1, capacity)
+        self._ids: "OrderedDict[str, None]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def seen(self, message_id: str) -> bool:
+        """记录消息 id，已经见过时返回 True（没有 id 的消息不去重）"""
+        if not message_id:
+            return False
+        if message_id in self._ids:
+            EVENTS_DROPPED.inc("duplicate")
+            return True
+        self._ids[message_id] = None
+        if len(self._ids) > self.capacity:
+            self._ids.popitem(last=False)
+        return False
+
+
+class _UserState:
+    __slots__ = ("tokens", "updated", "last_text", "last_at")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.last_text = ""
+        self.last_at = float("-inf")
+
+
+class FloodGuard:
+    """按用户限制指令频率
+
+    - repeat_window 秒内重复发送完全相同的指令只处理第一次（合并连发的 /投票、/行动）；
+    - 每个用户一个令牌桶（每秒补充 rate 个，容量 burst），没有令牌的指令直接丢弃。
+
+    被丢弃的指令不回复任何消息，刷屏不会放大机器人的发送量。rate <= 0 时不限制。
+    同时跟踪的用户数超过 max_users 时淘汰最久没有发指令的用户。
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: int = 5,
+        repeat_window: float = 3.0,
+        max_users: int = 4096,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.repeat_window = repeat_window
+        self.max_users = max(1, max_users)
+        self.clock = clock
+        self._users: "OrderedDict[str, _UserState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def allow(self, user_id: str, text: str) -> bool:
+        """用户的这条指令是否应当处理"""
+        if self.rate <= 0:
+            return True
+        now = self.clock()
+        state = self._users.get(user_id)
+        if state is None:
+            state = _UserState(float(self.burst), now)
+            self._users[user_id] = state
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * self.rate)
+            state.updated = now
+
+        if text == state.last_text and now - state.last_at < self.repeat_window:
+            EVENTS_DROPPED.inc("repeat")
+            return False
+        if state.tokens < 1:
+            EVENTS_DROPPED.inc("rate")
+            return False
+        state.tokens -= 1
+        state.last_text = text
+        state.last_at = now
+        return True
@@ -0,0 +1,220 @@
+from typing import Dict, List, Optional, Set
+
+from .models import Camp, Player, PlayerStatus, Role, get_role_camp
+from .names import NameIndex, normalize_name
+
+# 阵营编号（座位数组中 0 表示尚未分配角色）
+CAMP_CODES: Dict[Camp, int] = {camp: code for code, camp in enumerate(Camp, 1)}
+
+
+class PlayerIndex:
+    """玩家索引：按座位号存放玩家、存活状态和阵营
+
+    每名玩家占一个座位号（报名时按顺序分配，发牌时按座位顺序重排），
+    存活标记与阵营编号放在以座位号为下标的 bytearray 中，名称映射到座位号。
+    按角色查找、存活人数与各阵营存活人数另外增量维护，胜负判定和计票都是 O(1)。
+
+    所有对 Player.role / Player.status 的修改都必须经过本类，
+    否则座位数组会与玩家状态不一致。
+    """
+
+    def __init__(self):
+        self.players: Dict[str, Player] = {}  # user_id -> 玩家（报名顺序）
+        self.seats: List[Player] = []  # 座位号 -> 玩家
+        self._alive = bytearray()  # 座位号 -> 是否存活
+        self._camps = bytearray()  # 座位号 -> 阵营编号
+        self._by_name: Dict[str, int] = {}  # user_name -> 座位号
+        self._dropped: List[Player] = []  # 出局玩家（保持出局顺序）
+        self._by_role: Dict[Role, List[Player]] = {}  # 角色 -> 玩家（按座位顺序）
+        self._alive_count = 0
+        self._camp_alive = [0] * (len(CAMP_CODES) + 1)  # 阵营编号 -> 存活人数
+        self._alive_list: Optional[List[Player]] = None  # 存活玩家缓存，存活状态或座位变化时作废
+        self._normalized: Set[str] = set()  # 已使用的规范化昵称（报名查重用）
+        self._names: Optional[NameIndex] = None  # 玩家引用解析表，发牌重排座位时建立
+        self.version = 0  # 每次修改递增，供调用方判断缓存是否过期
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.players
+
+    def add(self, player: Player):
+        """登记新玩家，坐到最后一个座位"""
+        self.version += 1
+        player.seat = len(self.seats)
+        self.players[player.user_id] = player
+        self.seats.append(player)
+        alive = player.status == PlayerStatus.ALIVE
+        code = CAMP_CODES[get_role_camp(player.role)] if player.role is not None else 0
+        self._alive.append(alive)
+        self._camps.append(code)
+        self._alive_list = None
+        if player.role is not None:
+            self._by_role.setdefault(player.role, []).append(player)
+        if alive:
+            self._alive_count += 1
+            self._camp_alive[code] += 1
+        self._by_name[player.user_name] = player.seat
+        key = normalize_name(player.user_name)
+        if key:
+            self._normalized.add(key)
+        if self._names is not None:
+            self._names.add(player)
+        if player.status != PlayerStatus.ALIVE:
+            self._dropped.append(player)
+
+    def reseat(self, order: List[str]):
+        """按 user_id 列表重排座位（发牌时调用），不在列表中的玩家依次坐到后面"""
+        self.version += 1
+        seated = [self.players[user_id] for user_id in order]
+        listed = set(order)
+        seated.extend(p for p in self.players.values() if p.user_id not in listed)
+        alive = self._alive
+        camps = self._camps
+        self._alive = bytearray(alive[p.seat] for p in seated)
+        self._camps = bytearray(camps[p.seat] for p in seated)
+        for seat, player in enumerate(seated):
+            player.seat = seat
+        self.seats = seated
+        self._alive_list = None
+        self._by_name = {p.user_name: p.seat for p in seated}
+        for holders in self._by_role.values():
+            holders.sort(key=lambda p: p.seat)
+        self._names = NameIndex(seated)
+
+    def set_role(self, player: Player, role: Role):
+        """分配角色"""
+        self.version += 1
+        seat = player.seat
+        alive = self._alive[seat]
+        if player.role is not None:
+            self._by_role[player.role].remove(player)
+        code = CAMP_CODES[get_role_camp(role)]
+        if alive:
+            self._camp_alive[self._camps[seat]] -= 1
+            self._camp_alive[code] += 1
+        player.role = role
+        self._camps[seat] = code
+        holders = self._by_role.setdefault(role, [])
+        holders.append(player)
+        if len(holders) > 1 and holders[-2].seat > seat:
+            holders.sort(key=lambda p: p.seat)
+
+    def set_status(self, player: Player, status: PlayerStatus):
+        """修改玩家状态"""
+        self.version += 1
+        was_alive = self._alive[player.seat]
+        player.status = status
+        now_alive = status == PlayerStatus.ALIVE
+        self._alive[player.seat] = now_alive
+        if bool(was_alive) == now_alive:
+            return
+        delta = 1 if now_alive else -1
+        self._alive_count += delta
+        self._camp_alive[self._camps[player.seat]] += delta
+        self._alive_list = None
+        if now_alive:
+            self._dropped.remove(player)
+        else:
+            self._dropped.append(player)
+
+    def clear(self):
+        self.version += 1
+        self.players.clear()
+        self.seats.clear()
+        self._alive = bytearray()
+        self._camps = bytearray()
+        self._by_name.clear()
+        self._dropped.clear()
+        self._by_role.clear()
+        self._alive_count = 0
+        self._camp_alive = [0] * (len(CAMP_CODES) + 1)
+        self._alive_list = None
+        self._normalized.clear()
+        self._names = None
+
+    def get(self, user_id: str) -> Optional[Player]:
+        return self.players.get(user_id)
+
+    def by_seat(self, seat: int) -> Optional[Player]:
+        """按座位号（从 0 开始）获取玩家"""
+        return self.seats[seat] if 0 <= seat < len(self.seats) else None
+
+    def by_name(self, name: str) -> Optional[Player]:
+        """通过玩家名称获取玩家"""
+        seat = self._by_name.get(name)
+        return None if seat is None else self.seats[seat]
+
+    def name_taken(self, name: str) -> bool:
+        """昵称（或其规范化形式）是否已被使用"""
+        if name in self._by_name:
+            return True
+        key = normalize_name(name)
+        return bool(key) and key in self._normalized
+
+    @property
+    def names(self) -> NameIndex:
+        """玩家引用解析表（发牌前使用时按当前座位建立）"""
+        if self._names is None:
+            self._names = NameIndex(self.seats)
+        return self._names
+
+    def resolve(self, text: str) -> Optional[Player]:
+        """按昵称、规范化昵称、唯一前缀、座位号或 @ 提及查找玩家
+
+        有歧义时优先在存活玩家中挑选，仍无法确定时抛出 RuleError。
+        """
+        names = self._names if self._names is not None else self.names
+        return names.resolve(text, self.player_alive)
+
+    def by_role(self, role: Role, alive_only: bool = True) -> List[Player]:
+        """获取某角色的全部玩家（按座位顺序）"""
+        holders = self._by_role.get(role)
+        if not holders:
+            return []
+        if not alive_only:
+            return list(holders)
+        return [p for p in holders if self._alive[p.seat]]
+
+    def first_by_role(self, role: Role) -> Optional[Player]:
+        """获取某角色的第一个存活玩家"""
+        for player in self._by_role.get(role, ()):
+            if self._alive[player.seat]:
+                return player
+        return None
+
+    def is_alive(self, user_id: str) -> bool:
+        player = self.players.get(user_id)
+        return player is not None and bool(self._alive[player.seat])
+
+    def player_alive(self, player: Player) -> bool:
+        """已登记的玩家是否存活（调用方已持有 Player 时省去一次 user_id 查找）"""
+        return bool(self._alive[player.seat])
+
+    def alive_players(self) -> List[Player]:
+        """存活玩家（按座位顺序）"""
+        if self._alive_list is None:
+            alive = self._alive
+            self._alive_list = [p for p in self.seats if alive[p.seat]]
+        return list(self._alive_list)
+
+    def dropped_players(self) -> List[Player]:
+        return list(self._dropped)
+
+    @property
+    def alive_count(self) -> int:
+        return self._alive_count
+
+    @property
+    def dropped_count(self) -> int:
+        return len(self._dropped)
+
+    def in_camp(self, camp: Camp) -> List[Player]:
+        """某阵营的全部玩家（含出局，按座位顺序）"""
+        code = CAMP_CODES[camp]
+        return [p for p in self.seats if self._camps[p.seat] == code]
+
+    def alive_in_camp(self, camp: Camp) -> int:
+        """某阵营的存活人数"""
+        return self._camp_alive[CAMP_CODES[camp]]
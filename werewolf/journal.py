@@ -0,0 +1,138 @@
+import os
+import re
+import json
+import asyncio
+import logging
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger("astrbot")
+
+# 插件数据目录（相对于 AstrBot 运行目录）
+DEFAULT_DATA_DIR = os.path.join("data", "plugin_data", "astrbot_plugin_fail_werewolf")
+
+JOURNAL_SUFFIX = ".journal"
+SNAPSHOT_SUFFIX = ".snapshot.json"
+
+
+def file_stem(group_id: str) -> str:
+    """群号转成安全的文件名"""
+    return re.sub(r"[^0-9A-Za-z_.-]", "_", str(group_id)) or "_"
+
+
+class GameJournal:
+    """单个房间的追加式状态日志
+
+    record() 只把事件追加到内存缓冲区，不做任何磁盘 I/O，投票等高频操作不受影响；
+    commit() 在阶段切换时把缓冲区批量写入日志文件并 fsync；
+    snapshot() 写入完整快照（先写临时文件再原子替换）并清空日志。
+    磁盘操作在线程池中执行，由一把锁保证按调用顺序落盘。
+    """
+
+    def __init__(self, directory: str, group_id: str):
+        self.directory = directory
+        self.group_id = group_id
+        stem = file_stem(group_id)
+        self.path = os.path.join(directory, stem + JOURNAL_SUFFIX)
+        self.snapshot_path = os.path.join(directory, stem + SNAPSHOT_SUFFIX)
+        self._buffer: List[str] = []
+        self._lock = asyncio.Lock()
+
+    def record(self, event: Dict[str, Any]):
+        """追加一条事件（仅写入内存缓冲区）"""
+        self._buffer.append(json.dumps(event, ensure_ascii=False))
+
+    @property
+    def pending(self) -> int:
+        """尚未落盘的事件数"""
+        return len(self._buffer)
+
+    async def commit(self):
+        """把缓冲区中的事件写入日志并 fsync"""
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        await self._run(self._append, lines)
+
+    async def snapshot(self, state: Dict[str, Any]):
+        """写入完整快照并清空日志，state 必须已包含缓冲区中的全部事件"""
+        self._buffer = []
+        await self._run(self._write_snapshot, json.dumps(state, ensure_ascii=False))
+
+    async def discard(self):
+        """游戏结束后删除快照与日志"""
+        self._buffer = []
+        await self._run(self._remove)
+
+    async def _run(self, func, *args):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, func, *args)
+            except OSError as e:
+                logger.error(f"[挂科狼人杀] 写入游戏日志失败({self.group_id}): {e}")
+
+    def _append(self, lines: List[str]):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_snapshot(self, content: str):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # 快照已包含此前的全部事件，日志从头开始
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _remove(self):
+        for path in (self.path, self.snapshot_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _read_events(path: str) -> List[Dict[str, Any]]:
+    """读取日志，崩溃时写了一半的最后一行会被忽略"""
+    events = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    break
+    except FileNotFoundError:
+        pass
+    return events
+
+
+def load_journals(directory: str) -> List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """读取目录下所有未结束的房间，返回 [(快照, 快照之后的事件)]"""
+    if not os.path.isdir(directory):
+        return []
+    games = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(SNAPSHOT_SUFFIX):
+            continue
+        snapshot_path = os.path.join(directory, name)
+        try:
+            with open(snapshot_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"[挂科狼人杀] 读取游戏快照失败({name}): {e}")
+            continue
+        stem = name[:-len(SNAPSHOT_SUFFIX)]
+        games.append((state, _read_events(os.path.join(directory, stem + JOURNAL_SUFFIX))))
+    return games
+
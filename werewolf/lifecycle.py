@@ -0,0 +1,175 @@
+import sys
+import time
+import types
+import asyncio
+import logging
+from enum import Enum
+from typing import Callable, List, Optional, Tuple
+
+from .metrics import REGISTRY
+from .models import GamePhase
+from .timers import DeadlineService, TimerHandle
+
+logger = logging.getLogger("astrbot")
+
+SESSIONS_EVICTED = REGISTRY.counter(
+    "werewolf_sessions_evicted_total", "被回收的房间数（idle 为空闲超时，capacity 为超出房间数上限）", ("reason",),
+)
+SESSIONS_REFUSED = REGISTRY.counter(
+    "werewolf_sessions_refused_total", "房间数已达上限且没有可回收的房间，拒绝新建房间的次数",
+)
+
+# 房间数已满时可以让位给新房间的阶段：还没有发牌，关闭不会打断进行中的对局
+_RECLAIMABLE_PHASES = (GamePhase.WAITING, GamePhase.REGISTERING)
+
+# 估算内存时不展开的对象：类型、函数、枚举成员、事件循环与 Future 等共享或与房间无关的对象
+_OPAQUE = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.MethodType,
+    types.BuiltinFunctionType,
+    Enum,
+    asyncio.AbstractEventLoop,
+    asyncio.Future,
+    logging.Logger,
+)
+
+
+def estimate_size(*roots) -> int:
+    """粗略估算从 roots 出发可达对象的总字节数（sys.getsizeof 之和，每个对象只计一次）"""
+    seen = set()
+    total = 0
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if obj is None or id(obj) in seen or isinstance(obj, _OPAQUE):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float, bool)):
+            attrs = getattr(obj, "__dict__", None)
+            if attrs is not None:
+                stack.append(attrs)
+            for cls in type(obj).__mro__:
+                slots = cls.__dict__.get("__slots__", ())
+                for slot in (slots,) if isinstance(slots, str) else slots:
+                    stack.append(getattr(obj, slot, None))
+    return total
+
+
+class SessionLifecycle:
+    """房间生命周期：回收长时间无人操作的房间，并限制同时存在的房间数
+
+    房间在收到指令或进入新阶段时刷新活跃时间（SessionRegistry.touch）。
+    超过 idle_timeout 秒没有活动、且没有挂着未到期的阶段定时器的房间视为已废弃
+    （定时器丢失或阶段回调出错后卡住的房间也会被回收）。房间数达到 max_sessions 时，
+    新建房间前先回收最久未活动的空闲房间或仍在报名的房间；全部房间都在对局中时拒绝新建，
+    进行中的游戏不会被关闭。两项设为 0 均表示不限制。
+    """
+
+    def __init__(
+        self,
+        registry,
+        deadlines: DeadlineService,
+        idle_timeout: float = 1800,
+        max_sessions: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.registry = registry
+        self.deadlines = deadlines
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._timer: Optional[TimerHandle] = None
+
+    @property
+    def sweep_interval(self) -> float:
+        """空闲检查间隔"""
+        return max(1.0, min(60.0, self.idle_timeout / 2))
+
+    def start(self):
+        """开始定期检查空闲房间"""
+        if self.idle_timeout > 0 and self._timer is None:
+            self._timer = self.deadlines.call_later(self.sweep_interval, self._on_sweep)
+
+    def stop(self):
+        if self._timer is not None:
+            self.deadlines.cancel(self._timer)
+            self._timer = None
+
+    def _on_sweep(self):
+        self._timer = self.deadlines.call_later(self.sweep_interval, self._on_sweep)
+        asyncio.create_task(self.sweep())
+
+    def is_idle(self, session, now: float) -> bool:
+        """房间是否已空闲超时"""
+        if now - session.last_active < self.idle_timeout:
+            return False
+        # 阶段定时器还没到期的房间会在到期时自行推进，不算空闲
+        deadline = session.scheduler.deadline
+        return deadline is None or deadline <= session.scheduler.service.clock()
+
+    async def sweep(self) -> int:
+        """回收空闲房间，返回回收数量"""
+        now = self.clock()
+        idle = [session for session in self.registry.sessions() if self.is_idle(session, now)]
+        for session in idle:
+            await self.evict(session, "idle")
+        return len(idle)
+
+    def reclaimable(self, session, now: float) -> bool:
+        """房间数已满时能否关闭该房间给新房间让位：空闲超时或还没有开始对局"""
+        if session.game_phase in _RECLAIMABLE_PHASES:
+            return True
+        return self.idle_timeout > 0 and self.is_idle(session, now)
+
+    async def reserve(self) -> bool:
+        """新建房间前调用，返回能否新建
+
+        房间数已达上限时按最久未活动的顺序回收可让位的房间，没有可回收的房间时返回 False。
+        """
+        if self.max_sessions <= 0:
+            return True
+        while len(self.registry) >= self.max_sessions:
+            now = self.clock()
+            # 注册表按活跃时间排序，第一个可回收的就是最久未活动的
+            session = next((s for s in self.registry.sessions() if self.reclaimable(s, now)), None)
+            if session is None:
+                SESSIONS_REFUSED.inc()
+                return False
+            await self.evict(session, "capacity")
+        return True
+
+    async def evict(self, session, reason: str):
+        """关闭房间并释放其全部状态"""
+        SESSIONS_EVICTED.inc(reason)
+        logger.info(
+            f"[挂科狼人杀] 回收群 {session.group_id} 的房间（{session.game_phase.value}，"
+            f"{'空闲超时' if reason == 'idle' else '房间数已满'}）"
+        )
+        # 先从注册表移除，通知发送期间不会再被选中
+        session.reset_game()
+        try:
+            if reason == "idle":
+                await session._send_group_message("💤 本群的游戏长时间无人操作，已自动关闭")
+            else:
+                await session._send_group_message("🚪 同时进行的游戏太多，本群的游戏已被关闭，请稍后重新发起")
+            await session.outbox.flush()
+        except Exception as e:
+            logger.error(f"[挂科狼人杀] 发送房间关闭通知失败: {e}")
+
+    def report(self, limit: int = 10) -> Tuple[int, List[Tuple[object, int, float]]]:
+        """各房间的内存占用估算：(总字节数, [(房间, 字节数, 空闲秒数)])，按占用从大到小取前 limit 个"""
+        now = self.clock()
+        rows = [
+            (session, session.memory_usage(), now - session.last_active)
+            for session in self.registry.sessions()
+        ]
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return sum(row[1] for row in rows), rows[:limit]
@@ -0,0 +1,105 @@
+from typing import Optional
+from enum import Enum
+
+
+class GamePhase(Enum):
+    """游戏阶段"""
+    WAITING = "等待开始"  # 等待开始
+    REGISTERING = "报名中"  # 报名阶段
+    NIGHT = "深夜"  # 黑夜阶段
+    DAY = "白天"  # 白天阶段
+    VOTING = "投票中"  # 投票阶段
+    ENDED = "已结束"  # 游戏结束
+
+
+class PlayerStatus(Enum):
+    """玩家状态"""
+    ALIVE = "在学"  # 存活
+    DROPPED = "挂科"  # 出局
+    GRADUATED = "毕业"  # 胜利
+    SUSPENDED = "休学"  # 暂停
+
+
+class Role(Enum):
+    """角色类型"""
+    # 挂科阵营 (类似狼人)
+    BAD_STUDENT = "挂科生"  # 挂科生 (类似狼人)
+
+    # 学生阵营 (类似村民)
+    ORDINARY_STUDENT = "普通学生"  # 普通学生 (类似村民)
+    ACADEMIC_AFFAIRS = "教务处"  # 教务处 (类似预言家)
+    TEACHER = "任课老师"  # 任课老师 (类似女巫)
+    SCHOLARSHIP = "奖学金"  # 奖学金 (类似守卫)
+    TEACHING_ASSISTANT = "助教"  # 助教 (类似猎人)
+    EXCHANGE_STUDENT = "交换生"  # 交换生 (类似丘比特)
+    REPEATER = "重修生"  # 重修生 (类似盗贼)
+    ACADEMIC_WARNING = "学业预警"  # 学业预警 (类似白狼王)
+    LIBRARIAN = "图书馆管理员"  # 图书馆管理员 (类似禁言长老)
+    STUDENT_UNION = "学生会主席"  # 学生会主席 (类似长老)
+    CHEATER = "作弊者"  # 作弊者 (类似隐狼)
+
+
+class Camp(Enum):
+    """阵营（胜负判定用）"""
+    WEREWOLF = "挂科阵营"
+    STUDENT = "学生阵营"
+
+
+class DeathCause(Enum):
+    """出局原因"""
+    NIGHT_KILL = "被挂科"  # 夜晚被挂科生淘汰
+    POISON = "被挂科警告"  # 被任课老师毒药淘汰
+    VOTE = "被投票退学"  # 白天被投票淘汰
+    LOVER = "殉情"  # 交换生情侣连带出局
+    TAKEN = "被助教带走"  # 被助教技能带走
+
+
+class RuleError(Exception):
+    """违反游戏规则的操作，消息文本可直接回复给玩家"""
+
+
+# 挂科阵营角色
+WEREWOLF_ROLES = (Role.BAD_STUDENT, Role.ACADEMIC_WARNING, Role.CHEATER)
+
+
+def get_role_camp(role: Role) -> Camp:
+    """角色所属阵营，第三方角色在胜负判定中计入学生阵营"""
+    return Camp.WEREWOLF if role in WEREWOLF_ROLES else Camp.STUDENT
+
+
+class Player:
+    """玩家信息
+
+    使用 __slots__：每个房间同时持有十几个玩家对象，省去每个实例的 __dict__。
+    role / status 只能通过 PlayerIndex 修改，seat 由 PlayerIndex 分配。
+    """
+
+    __slots__ = (
+        "user_id", "user_name", "role", "status", "group_id", "seat",
+        "is_exposed", "is_protected", "is_poisoned", "is_exchanged", "partner",
+    )
+
+    def __init__(
+        self,
+        user_id: str,
+        user_name: str,
+        role: Optional[Role] = None,
+        status: PlayerStatus = PlayerStatus.ALIVE,
+        group_id: Optional[str] = None,
+        partner: Optional[str] = None,
+    ):
+        self.user_id = user_id
+        self.user_name = user_name
+        self.role = role
+        self.status = status
+        self.group_id = group_id
+        self.seat = -1  # 座位号（从 0 开始），登记到 PlayerIndex 时分配
+        self.is_exposed = False  # 是否被教务处查验过
+        self.is_protected = False  # 是否被奖学金保护
+        self.is_poisoned = False  # 是否被任课老师挂科
+        self.is_exchanged = False  # 是否被交换生连接
+        self.partner = partner  # 交换生连接的对象
+
+    def __repr__(self) -> str:
+        role = self.role.name if self.role else None
+        return f"Player({self.user_id!r}, {self.user_name!r}, seat={self.seat}, role={role}, status={self.status.name})"
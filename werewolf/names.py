@@ -0,0 +1,101 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .models import Player, RuleError
+
+# @ 提及：OneBot CQ 码，或消息文本中的 @昵称 / @QQ号
+_CQ_AT = re.compile(r"^\[CQ:at,qq=(\w+)[^\]]*\]$")
+# 座位号：3 / 3号 / #3（座位号从 1 开始显示）
+_SEAT = re.compile(r"^#?(\d{1,2})号?$")
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name: str) -> str:
+    """昵称的宽松形式：全角转半角、忽略大小写，去掉空白、emoji 等符号和不可见字符"""
+    text = unicodedata.normalize("NFKC", name).casefold()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in "SZC")
+
+
+class NameIndex:
+    """玩家引用解析：原始昵称、规范化昵称、唯一前缀、座位号与 @ 提及
+
+    开局发牌时按座位建一次，之后有玩家加入时增量登记；每次解析都是几次字典查找。
+    前缀表登记了每个规范化昵称的全部前缀，在第一次需要前缀匹配时才建立，
+    之后查找代价只与输入长度有关。
+    """
+
+    def __init__(self, seats: Sequence[Player]):
+        self.seats: List[Player] = []
+        self._exact: Dict[str, Player] = {}  # 原始昵称 -> 玩家
+        self._ids: Dict[str, Player] = {}  # user_id -> 玩家
+        self._normalized: Dict[str, List[Player]] = {}  # 规范化昵称 -> 玩家
+        self._prefixes: Optional[Dict[str, List[Player]]] = None  # 规范化昵称的前缀 -> 玩家（按需建立）
+        for player in seats:
+            self.add(player)
+
+    def add(self, player: Player):
+        """登记一名玩家（坐到最后一个座位）"""
+        self.seats.append(player)
+        self._exact[player.user_name] = player
+        self._ids[player.user_id] = player
+        key = normalize_name(player.user_name)
+        if not key:
+            return
+        self._normalized.setdefault(key, []).append(player)
+        if self._prefixes is not None:
+            self._add_prefixes(key, player)
+
+    def _add_prefixes(self, key: str, player: Player):
+        if not key:
+            return
+        for end in range(1, len(key) + 1):
+            self._prefixes.setdefault(key[:end], []).append(player)
+
+    def resolve(self, text: str, eligible: Optional[Callable[[Player], bool]] = None) -> Optional[Player]:
+        """把玩家输入的引用解析成玩家，找不到时返回 None
+
+        规范化昵称与前缀匹配到多名玩家时，只在 eligible 为真的玩家中挑选
+        （例如只看存活玩家），仍有多人时抛出 RuleError 让玩家写完整。
+        """
+        text = text.strip()
+        if not text:
+            return None
+        player = self._exact.get(text)
+        if player is not None:
+            return player
+
+        # @ 提及：先按 QQ 号，再按昵称
+        mention = _CQ_AT.match(text)
+        if mention is not None:
+            return self._ids.get(mention.group(1))
+        if text[0] in "@＠":
+            text = text[1:].strip()
+            player = self._ids.get(text) or self._exact.get(text)
+            if player is not None:
+                return player
+
+        key = normalize_name(text)
+        if not key:
+            return None
+        candidates = self._normalized.get(key)
+        if candidates is None:
+            seat = _SEAT.match(key)
+            if seat is not None:
+                number = int(seat.group(1))
+                if 1 <= number <= len(self.seats):
+                    return self.seats[number - 1]
+            if self._prefixes is None:
+                self._prefixes = {}
+                for each in self.seats:
+                    self._add_prefixes(normalize_name(each.user_name), each)
+            candidates = self._prefixes.get(key)
+        if not candidates:
+            return None
+        if len(candidates) > 1 and eligible is not None:
+            candidates = [p for p in candidates if eligible(p)] or candidates
+        if len(candidates) > 1:
+            names = "、".join(f"{p.seat + 1}号{p.user_name}" for p in candidates)
+            raise RuleError(f"「{text}」可能是：{names}，请写完整昵称或座位号")
+        return candidates[0]
@@ -0,0 +1,328 @@
+"""夜晚行动的解析与结算
+
+行动在提交时校验并解析成 NightAction（目标已解析为 user_id），天亮时按
+NIGHT_PIPELINE 的顺序逐个角色结算，整个过程只遍历一次当晚的行动：
+
+    交换生（仅第一晚） → 作弊者 → 挂科生、学业预警 → 教务处 → 奖学金
+    → 图书馆管理员 → 任课老师 → 结算出局
+
+与 get_game_rules 中公布的夜晚行动顺序一致。
+"""
+import re
+from enum import Enum
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .models import Camp, Player, Role, RuleError, get_role_camp
+
+if TYPE_CHECKING:
+    from .engine import GameEngine
+
+
+class ActionKind(Enum):
+    """夜晚行动类型"""
+    SKIP = "跳过"
+    LINK = "连接情侣"
+    INTERFERE = "干扰"
+    KILL = "挂科"
+    INSPECT = "查验身份"
+    CHECK = "查验阵营"
+    PROTECT = "保护"
+    SILENCE = "禁言"
+    SAVE = "救人"
+    POISON = "毒人"
+
+
+# 各角色的默认行动（任课老师需用 救/毒 前缀区分）
+ROLE_ACTION_KINDS: Dict[Role, ActionKind] = {
+    Role.EXCHANGE_STUDENT: ActionKind.LINK,
+    Role.CHEATER: ActionKind.INTERFERE,
+    Role.BAD_STUDENT: ActionKind.KILL,
+    Role.ACADEMIC_WARNING: ActionKind.INSPECT,
+    Role.ACADEMIC_AFFAIRS: ActionKind.CHECK,
+    Role.SCHOLARSHIP: ActionKind.PROTECT,
+    Role.LIBRARIAN: ActionKind.SILENCE,
+}
+
+# 只在第一晚行动的角色
+FIRST_NIGHT_ONLY = (Role.EXCHANGE_STUDENT,)
+
+SKIP_WORDS = ("跳过", "skip", "不行动", "")
+
+_NAME_SPLIT = re.compile(r"[\s,，、]+")
+
+
+@dataclass
+class NightAction:
+    """解析后的夜晚行动"""
+    actor: str
+    kind: ActionKind
+    targets: Tuple[str, ...] = ()  # 目标 user_id
+
+    @property
+    def target(self) -> Optional[str]:
+        return self.targets[0] if self.targets else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"kind": self.kind.name, "targets": list(self.targets)}
+
+    @classmethod
+    def from_dict(cls, actor: str, data: Dict[str, Any]) -> "NightAction":
+        return cls(actor, ActionKind[data["kind"]], tuple(data.get("targets", ())))
+
+
+@dataclass
+class NightState:
+    """跨夜晚保留的技能状态"""
+    save_used: bool = False  # 任课老师的平时成绩已用
+    poison_used: bool = False  # 任课老师的挂科警告已用
+    last_protected: Optional[str] = None  # 奖学金上一晚保护的玩家
+    last_silenced: Optional[str] = None  # 图书馆管理员上一晚禁言的玩家
+    silenced: Optional[str] = None  # 今天被禁言的玩家
+    credits: Dict[str, int] = field(default_factory=dict)  # 学生会主席剩余学分
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "save_used": self.save_used,
+            "poison_used": self.poison_used,
+            "last_protected": self.last_protected,
+            "last_silenced": self.last_silenced,
+            "silenced": self.silenced,
+            "credits": dict(self.credits),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NightState":
+        return cls(**data)
+
+
+def _resolve_target(engine: "GameEngine", name: str) -> Player:
+    """按昵称（或前缀、座位号、@ 提及）找到存活玩家"""
+    target = engine.index.resolve(name)
+    if target is None or not engine.index.player_alive(target):
+        raise RuleError(f"找不到玩家 {name} 或该玩家已出局")
+    return target
+
+
+def parse_night_action(engine: "GameEngine", player: Player, text: str) -> NightAction:
+    """按角色和当前存活玩家校验 /行动 的文本，解析成 NightAction
+
+    不合法的行动抛出 RuleError，消息可直接回复给玩家；
+    通过校验的行动在天亮结算时不再需要任何字符串处理和昵称查找。
+    """
+    if player.user_id not in engine.night_actors:
+        raise RuleError("你今晚没有需要执行的行动")
+    text = text.strip()
+    if text.lower() in SKIP_WORDS:
+        return NightAction(player.user_id, ActionKind.SKIP)
+
+    state = engine.night_state
+    if player.role == Role.TEACHER:
+        if text[0] == "救":
+            kind = ActionKind.SAVE
+            if state.save_used:
+                raise RuleError("平时成绩已经用过了")
+        elif text[0] == "毒":
+            kind = ActionKind.POISON
+            if state.poison_used:
+                raise RuleError("挂科警告已经用过了")
+        else:
+            raise RuleError("请使用 /行动 救 玩家名称 或 /行动 毒 玩家名称")
+        text = text[1:].strip()
+    else:
+        kind = ROLE_ACTION_KINDS[player.role]
+
+    if kind == ActionKind.LINK:
+        names = [n for n in _NAME_SPLIT.split(text) if n]
+        if len(names) != 2:
+            raise RuleError("请选择两名玩家，名字之间用空格分隔")
+        targets = tuple(_resolve_target(engine, name).user_id for name in names)
+        if targets[0] == targets[1]:
+            raise RuleError("请选择两名不同的玩家")
+        return NightAction(player.user_id, kind, targets)
+
+    if not text:
+        raise RuleError("请在指令后写上目标玩家的名称")
+    target = _resolve_target(engine, text)
+    if kind == ActionKind.PROTECT and target.user_id == state.last_protected:
+        raise RuleError("不能连续两晚保护同一名学生")
+    if kind == ActionKind.SILENCE and target.user_id == state.last_silenced:
+        raise RuleError("不能连续两晚禁言同一名玩家")
+    return NightAction(player.user_id, kind, (target.user_id,))
+
+
+def describe_action(engine: "GameEngine", action: NightAction) -> str:
+    """行动的文字说明，用于回复玩家"""
+    if action.kind == ActionKind.SKIP:
+        return "今晚不行动"
+    names = "、".join(engine.index.players[uid].user_name for uid in action.targets)
+    return f"{action.kind.value} {names}"
+
+
+@dataclass
+class NightResult:
+    """夜晚结算结果（出局尚未执行，由调用方逐个 eliminate）"""
+    killed: List[Player] = field(default_factory=list)  # 被挂科生淘汰
+    poisoned: List[Player] = field(default_factory=list)  # 被任课老师毒药淘汰
+    protected: List[Player] = field(default_factory=list)  # 被奖学金保护
+    saved: List[Player] = field(default_factory=list)  # 被任课老师救回
+    silenced: List[Player] = field(default_factory=list)  # 今天被禁言
+    notices: List[Tuple[str, str]] = field(default_factory=list)  # 私聊通知 (user_id, 内容)
+
+
+class NightContext:
+    """一次结算过程中的中间状态"""
+
+    def __init__(self, engine: "GameEngine"):
+        self.engine = engine
+        self.result = NightResult()
+        self.kill_target: Optional[str] = None
+        self.protected: Set[str] = set()
+        self.interfered: Set[str] = set()
+        self.saved: Optional[str] = None
+        self.poisoned: Optional[str] = None
+
+    def player(self, user_id: Optional[str]) -> Optional[Player]:
+        return self.engine.index.get(user_id) if user_id else None
+
+    def notify(self, user_id: str, content: str):
+        self.result.notices.append((user_id, content))
+
+
+Handler = Callable[[NightContext, List[NightAction]], None]
+
+
+def _resolve_link(ctx: NightContext, actions: List[NightAction]):
+    """交换生：第一晚连接两名玩家成为情侣"""
+    for action in actions:
+        if action.kind != ActionKind.LINK or len(set(action.targets)) != 2:
+            continue
+        first, second = (ctx.player(uid) for uid in action.targets)
+        first.partner, second.partner = second.user_id, first.user_id
+        first.is_exchanged = second.is_exchanged = True
+        ctx.engine.record_link(first.user_id, second.user_id)
+        ctx.notify(first.user_id, f"💞 你和 {second.user_name} 成为了情侣，一方出局另一方也会殉情")
+        ctx.notify(second.user_id, f"💞 你和 {first.user_name} 成为了情侣，一方出局另一方也会殉情")
+
+
+def _resolve_interfere(ctx: NightContext, actions: List[NightAction]):
+    """作弊者：干扰目标，使其今晚被查验时显示为学生阵营"""
+    for action in actions:
+        if action.kind == ActionKind.INTERFERE and action.target:
+            ctx.interfered.add(action.target)
+
+
+def _resolve_werewolves(ctx: NightContext, actions: List[NightAction]):
+    """挂科生投票选出挂科目标；学业预警查验一名玩家的具体身份"""
+    votes = Counter()
+    for action in actions:
+        if action.kind == ActionKind.KILL and action.target:
+            votes[action.target] += 1
+        elif action.kind == ActionKind.INSPECT and action.target:
+            target = ctx.player(action.target)
+            ctx.notify(action.actor, f"🔎 查验结果：{target.user_name} 的身份是 {target.role.value}")
+    if votes:
+        top = max(votes.values())
+        candidates = [uid for uid, count in votes.items() if count == top]
+        ctx.kill_target = ctx.engine.rng.choice(candidates)
+
+
+def _resolve_check(ctx: NightContext, actions: List[NightAction]):
+    """教务处：查验目标是否为挂科生（被作弊者干扰的目标显示为学生阵营）"""
+    for action in actions:
+        if action.kind != ActionKind.CHECK or not action.target:
+            continue
+        target = ctx.player(action.target)
+        target.is_exposed = True
+        is_bad = get_role_camp(target.role) == Camp.WEREWOLF and target.user_id not in ctx.interfered
+        ctx.notify(action.actor, f"🔍 查验结果：{target.user_name} {'是' if is_bad else '不是'}挂科生")
+
+
+def _resolve_protect(ctx: NightContext, actions: List[NightAction]):
+    """奖学金：保护一名学生免于挂科，不能连续两晚保护同一人"""
+    state = ctx.engine.night_state
+    protected = None
+    for action in actions:
+        if action.kind == ActionKind.PROTECT and action.target and action.target != state.last_protected:
+            protected = action.target
+            ctx.protected.add(protected)
+            ctx.player(protected).is_protected = True
+    state.last_protected = protected
+
+
+def _resolve_silence(ctx: NightContext, actions: List[NightAction]):
+    """图书馆管理员：禁言一名玩家，使其第二天不能发言，不能连续两晚禁言同一人"""
+    state = ctx.engine.night_state
+    silenced = None
+    for action in actions:
+        if action.kind == ActionKind.SILENCE and action.target and action.target != state.last_silenced:
+            silenced = action.target
+            ctx.result.silenced.append(ctx.player(silenced))
+    state.last_silenced = state.silenced = silenced
+
+
+def _resolve_teacher(ctx: NightContext, actions: List[NightAction]):
+    """任课老师：平时成绩救回今晚的挂科目标，或用挂科警告淘汰一人；两瓶药各用一次"""
+    state = ctx.engine.night_state
+    for action in actions:
+        if action.kind == ActionKind.SAVE and not state.save_used:
+            if action.target and action.target == ctx.kill_target and action.target not in ctx.protected:
+                ctx.saved = action.target
+                state.save_used = True
+        elif action.kind == ActionKind.POISON and not state.poison_used and action.target:
+            ctx.poisoned = action.target
+            ctx.player(action.target).is_poisoned = True
+            state.poison_used = True
+
+
+# 夜晚结算顺序表：(参与的角色, 处理函数)
+NIGHT_PIPELINE: List[Tuple[Tuple[Role, ...], Handler]] = [
+    ((Role.EXCHANGE_STUDENT,), _resolve_link),
+    ((Role.CHEATER,), _resolve_interfere),
+    ((Role.BAD_STUDENT, Role.ACADEMIC_WARNING), _resolve_werewolves),
+    ((Role.ACADEMIC_AFFAIRS,), _resolve_check),
+    ((Role.SCHOLARSHIP,), _resolve_protect),
+    ((Role.LIBRARIAN,), _resolve_silence),
+    ((Role.TEACHER,), _resolve_teacher),
+]
+
+
+def build_pipeline(roles: Set[Role]) -> List[Tuple[Tuple[Role, ...], Handler]]:
+    """按本局实际出现的角色裁剪结算表（每局开始时构建一次）"""
+    return [(step_roles, handler) for step_roles, handler in NIGHT_PIPELINE if roles.intersection(step_roles)]
+
+
+def resolve_night(engine: "GameEngine") -> NightResult:
+    """按结算表依次处理当晚行动，最后确定出局名单"""
+    by_role: Dict[Role, List[NightAction]] = {}
+    players = engine.index.players
+    for action in engine.night_actions.values():
+        if engine.index.is_alive(action.actor):
+            by_role.setdefault(players[action.actor].role, []).append(action)
+
+    ctx = NightContext(engine)
+    for step_roles, handler in engine.night_pipeline:
+        actions = [a for role in step_roles for a in by_role.get(role, ())]
+        handler(ctx, actions)
+
+    result = ctx.result
+    state = engine.night_state
+    target = ctx.player(ctx.kill_target)
+    if target is not None:
+        if target.user_id in ctx.protected:
+            result.protected.append(target)
+        elif target.user_id == ctx.saved:
+            result.saved.append(target)
+        elif state.credits.get(target.user_id, 0) > 1:
+            # 学生会主席第一次被挂科只失去一颗学分
+            state.credits[target.user_id] -= 1
+            ctx.notify(target.user_id, "👑 你昨晚被挂科，失去了一颗学分，下次被挂科将会出局")
+        else:
+            result.killed.append(target)
+
+    poisoned = ctx.player(ctx.poisoned)
+    if poisoned is not None and poisoned not in result.killed:
+        # 毒药无视奖学金保护与学生会主席的学分
+        result.poisoned.append(poisoned)
+    return result
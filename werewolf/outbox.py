@@ -0,0 +1,84 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+
+class GroupOutbox:
+    """单个群的出站消息队列
+
+    window 秒内排队的消息合并成一条发送；带 key 的消息（如投票进度）
+    会替换队列中尚未发出的同 key 旧消息。阶段切换时调用 flush()
+    立即发出已排队的内容，保证消息顺序。
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[None]],
+        window: float = 1.0,
+        max_length: int = 3000,
+        separator: str = "\n\n",
+    ):
+        self._send = send
+        self.window = window
+        self.max_length = max_length
+        self.separator = separator
+        self._pending: List[Tuple[Optional[str], str]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def post(self, content: str, key: Optional[str] = None):
+        """排队一条消息"""
+        if key is not None:
+            self._pending = [(k, c) for k, c in self._pending if k != key]
+        self._pending.append((key, content))
+
+        if self.window <= 0:
+            self._ensure_timer(0)
+        elif self._timer is None or self._timer.done():
+            self._ensure_timer(self.window)
+
+    def _ensure_timer(self, delay: float):
+        if self._timer is not None and not self._timer.done():
+            return
+        self._timer = asyncio.create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay: float):
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._timer = None
+        await self.flush()
+
+    def _take_batches(self) -> List[str]:
+        """取出队列并按长度上限拼成若干条消息"""
+        batches: List[str] = []
+        current = ""
+        for _, content in self._pending:
+            content = content.rstrip("\n")
+            if current and len(current) + len(self.separator) + len(content) > self.max_length:
+                batches.append(current)
+                current = content
+            else:
+                current = f"{current}{self.separator}{content}" if current else content
+        if current:
+            batches.append(current)
+        self._pending = []
+        return batches
+
+    async def flush(self):
+        """立即发出所有排队消息"""
+        timer = self._timer
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+            self._timer = None
+        async with self._lock:
+            for content in self._take_batches():
+                await self._send(content)
+
+    def cancel(self):
+        """丢弃排队消息并停止定时器"""
+        self._pending = []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
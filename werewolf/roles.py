@@ -0,0 +1,176 @@
+import random
+from typing import Dict, List, Optional
+
+from .models import Role
+
+
+def default_bad_count(player_count: int) -> int:
+    """按人数自动决定的挂科生数量"""
+    if player_count <= 6:
+        return 2
+    elif player_count <= 8:
+        return 3
+    return 4
+
+
+def generate_roles(
+    player_count: int,
+    roles_config: Dict[str, int],
+    rng: Optional[random.Random] = None,
+) -> List[Role]:
+    """根据玩家人数生成角色列表"""
+    roles = []
+
+    # 计算挂科生数量：配置为 0 或未配置时按人数自动决定
+    bad_count = roles_config.get("bad_student", 0)
+    if bad_count <= 0:
+        bad_count = default_bad_count(player_count)
+
+    # 添加挂科生
+    roles.extend([Role.BAD_STUDENT] * bad_count)
+
+    # 添加特殊角色
+    if roles_config.get("academic_affairs", 1):
+        roles.append(Role.ACADEMIC_AFFAIRS)
+
+    if roles_config.get("teacher", 1):
+        roles.append(Role.TEACHER)
+
+    if roles_config.get("scholarship", 1):
+        roles.append(Role.SCHOLARSHIP)
+
+    if roles_config.get("teaching_assistant", 1):
+        roles.append(Role.TEACHING_ASSISTANT)
+
+    if roles_config.get("exchange_student", 0) and player_count >= 8:
+        roles.append(Role.EXCHANGE_STUDENT)
+
+    if roles_config.get("repeater", 0) and player_count >= 9:
+        roles.append(Role.REPEATER)
+
+    if roles_config.get("academic_warning", 0) and player_count >= 10:
+        roles.append(Role.ACADEMIC_WARNING)
+
+    if roles_config.get("librarian", 0) and player_count >= 11:
+        roles.append(Role.LIBRARIAN)
+
+    if roles_config.get("student_union", 0) and player_count >= 12:
+        roles.append(Role.STUDENT_UNION)
+
+    if roles_config.get("cheater", 0) and player_count >= 13:
+        roles.append(Role.CHEATER)
+
+    # 填充普通学生
+    ordinary_count = player_count - len(roles)
+    roles.extend([Role.ORDINARY_STUDENT] * ordinary_count)
+
+    # 随机打乱
+    (rng or random).shuffle(roles)
+    return roles
+
+
+# 角色描述
+ROLE_DESCRIPTIONS: Dict[Role, str] = {
+    Role.BAD_STUDENT: (
+        "🔴 【挂科生】- 挂科阵营\n"
+        "能力：每晚可以集体讨论，选择一名学生挂科（使其出局）\n"
+        "胜利条件：淘汰所有学生阵营玩家"
+    ),
+    Role.ORDINARY_STUDENT: (
+        "🎓 【普通学生】- 学生阵营\n"
+        "能力：无特殊能力，凭借敏锐的观察力找出挂科生\n"
+        "胜利条件：找出并淘汰所有挂科生"
+    ),
+    Role.ACADEMIC_AFFAIRS: (
+        "🏛️ 【教务处】- 学生阵营\n"
+        "能力：每晚可以查验一名玩家的身份，确认其是否为挂科生\n"
+        "胜利条件：找出并淘汰所有挂科生"
+    ),
+    Role.TEACHER: (
+        "👨‍🏫 【任课老师】- 学生阵营\n"
+        "能力：拥有两瓶药水\n"
+        "  平时成绩（救药）：可以救活一名被挂科的学生\n"
+        "  挂科警告（毒药）：可以让一名学生挂科出局\n"
+        "  注意：同一晚不能使用两种药水\n"
+        "胜利条件：找出并淘汰所有挂科生"
+    ),
+    Role.SCHOLARSHIP: (
+        "🏅 【奖学金】- 学生阵营\n"
+        "能力：每晚可以保护一名学生，使其不会被挂科\n"
+        "  但不能连续两晚保护同一名学生\n"
+        "  被保护的学生如果被任课老师用毒药挂科，仍然会出局\n"
+        "胜利条件：找出并淘汰所有挂科生"
+    ),
+    Role.TEACHING_ASSISTANT: (
+        "👨‍🎓 【助教】- 学生阵营\n"
+        "能力：当被挂科（夜晚被淘汰或白天被投票出局）时\n"
+        "  可以带走一名学生一起出局\n"
+        "  被挂科时不能发动技能\n"
+        "胜利条件：找出并淘汰所有挂科生"
+    ),
+    Role.EXCHANGE_STUDENT: (
+        "🌍 【交换生】- 第三方阵营\n"
+        "能力：游戏开始时选择两名玩家成为情侣\n"
+        "  情侣中一人出局，另一人也会殉情出局\n"
+        "  交换生自身可能与情侣同阵营或不同阵营\n"
+        "胜利条件：与情侣一起活到最后"
+    ),
+    Role.REPEATER: (
+        "🔄 【重修生】- 随机阵营\n"
+        "能力：游戏开始时从两张身份牌中选择一张作为身份\n"
+        "  如果两张身份牌中有挂科生，则必须选择挂科生\n"
+        "  否则可以选择任意身份\n"
+        "胜利条件：根据所选身份决定"
+    ),
+    Role.ACADEMIC_WARNING: (
+        "⚠️ 【学业预警】- 挂科阵营\n"
+        "能力：每晚可以额外查验一名玩家的具体身份\n"
+        "  白天发言阶段，可以自爆带走一名玩家\n"
+        "胜利条件：淘汰所有学生阵营玩家"
+    ),
+    Role.LIBRARIAN: (
+        "📚 【图书馆管理员】- 学生阵营\n"
+        "能力：每晚可以禁言一名玩家，使其第二天不能发言\n"
+        "  不能连续两晚禁言同一名玩家\n"
+        "  被禁言的玩家仍可以投票\n"
+        "胜利条件：找出并淘汰所有挂科生"
+    ),
+    Role.STUDENT_UNION: (
+        "👑 【学生会主席】- 学生阵营\n"
+        "能力：有两颗学分（两条命）\n"
+        "  第一次被挂科不会出局，只会失去一颗学分\n"
+        "  被任课老师用毒药挂科时直接出局\n"
+        "胜利条件：找出并淘汰所有挂科生"
+    ),
+    Role.CHEATER: (
+        "🎭 【作弊者】- 挂科阵营\n"
+        "能力：白天不会被教务处查验为挂科生\n"
+        "  只有晚上被教务处查验时才会暴露身份\n"
+        "  挂科生不知道作弊者的身份\n"
+        "胜利条件：淘汰所有学生阵营玩家"
+    ),
+}
+
+# 角色夜晚行动说明
+ROLE_NIGHT_ACTIONS: Dict[Role, str] = {
+    Role.BAD_STUDENT: "请选择一名学生挂科（淘汰）",
+    Role.ACADEMIC_AFFAIRS: "请选择一名学生查验其身份",
+    Role.TEACHER: "请选择使用平时成绩（救人）或挂科警告（淘汰）",
+    Role.SCHOLARSHIP: "请选择一名学生保护（使其今晚不会被挂科）",
+    Role.ACADEMIC_WARNING: "请选择一名学生查验其具体身份",
+    Role.LIBRARIAN: "请选择一名学生禁言（使其明天不能发言）",
+    Role.CHEATER: "请选择一名学生进行干扰（使其被查验时显示为学生阵营）",
+    Role.EXCHANGE_STUDENT: "请选择两名玩家成为情侣（仅第一晚，名字之间用空格分隔）",
+}
+
+NO_NIGHT_ACTION = "无夜晚行动"
+
+
+def get_role_description(role: Role) -> str:
+    """获取角色描述"""
+    return ROLE_DESCRIPTIONS.get(role, "未知角色")
+
+
+def get_role_night_action(role: Role) -> str:
+    """获取角色夜晚行动说明"""
+    return ROLE_NIGHT_ACTIONS.get(role, NO_NIGHT_ACTION)
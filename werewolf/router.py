@@ -0,0 +1,90 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from collections import Counter
+
+
+class Command:
+    """一条指令及其别名"""
+
+    __slots__ = ("name", "aliases", "handler", "exact", "needs_arg")
+
+    def __init__(
+        self,
+        name: str,
+        aliases: Tuple[str, ...],
+        handler: Callable[..., Awaitable[None]],
+        exact: bool = False,
+        needs_arg: bool = False,
+    ):
+        self.name = name
+        self.aliases = aliases
+        self.handler = handler
+        self.exact = exact  # 是否要求整条消息完全匹配
+        self.needs_arg = needs_arg  # 是否必须带参数
+
+
+class CommandRouter:
+    """预编译的指令路由表
+
+    完全匹配的指令放在字典里 O(1) 查找；前缀指令按首字符分桶，
+    桶内按前缀长度从长到短排列，每条消息只需检查首字符对应的少数几个前缀。
+    """
+
+    def __init__(self):
+        self._exact: Dict[str, Command] = {}
+        self._prefix: Dict[str, List[Tuple[str, Command]]] = {}
+        self.counts: Counter = Counter()  # 指令名 -> 分发次数
+
+    def add(
+        self,
+        name: str,
+        aliases: Tuple[str, ...],
+        handler: Callable[..., Awaitable[None]],
+        exact: bool = False,
+        needs_arg: bool = False,
+    ) -> Command:
+        """注册指令，aliases 中的每个写法都会路由到同一个 handler"""
+        command = Command(name, aliases, handler, exact, needs_arg)
+        for alias in aliases:
+            if exact:
+                self._exact[alias] = command
+            else:
+                bucket = self._prefix.setdefault(alias[0], [])
+                bucket.append((alias, command))
+                bucket.sort(key=lambda item: len(item[0]), reverse=True)
+        return command
+
+    def match(self, text: str) -> Optional[Tuple[Command, str]]:
+        """匹配指令，返回 (指令, 参数)，不是指令时返回 None"""
+        if not text:
+            return None
+        command = self._exact.get(text)
+        if command is not None:
+            return command, ""
+        for prefix, command in self._prefix.get(text[0], ()):
+            if text.startswith(prefix):
+                arg = text[len(prefix):].strip()
+                if command.needs_arg and not arg:
+                    return None
+                return command, arg
+        return None
+
+    def is_command(self, text: str) -> bool:
+        return self.match(text) is not None
+
+    async def dispatch(self, text: str, *args) -> bool:
+        """匹配并执行指令，handler 的参数为 (*args, arg)；返回是否命中指令"""
+        matched = self.match(text)
+        if matched is None:
+            return False
+        await self.invoke(matched, *args)
+        return True
+
+    async def invoke(self, matched: Tuple[Command, str], *args):
+        """执行 match() 的结果"""
+        command, arg = matched
+        self.counts[command.name] += 1
+        await command.handler(*args, arg)
+
+    def stats(self) -> Dict[str, int]:
+        """各指令的分发次数"""
+        return dict(self.counts)
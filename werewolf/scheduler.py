@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from .metrics import PHASE_ENDINGS, PHASE_SECONDS, phase_label
+from .models import GamePhase
+from .timers import DeadlineService, TimerHandle
+
+logger = logging.getLogger("astrbot")
+
+_default_service: Optional[DeadlineService] = None
+
+
+def get_default_service() -> DeadlineService:
+    """进程内共享的截止时间服务"""
+    global _default_service
+    if _default_service is None:
+        _default_service = DeadlineService()
+    return _default_service
+
+
+class PhaseScheduler:
+    """房间阶段定时器：同一时刻只保留一个可取消的阶段句柄
+
+    arm() 设置当前阶段的超时回调（会取消上一个阶段的定时器），
+    advance() 在所有玩家都已行动时立即执行回调，reschedule() 在房间修改
+    阶段时长后调整截止时间，cancel() 用于重置/取消游戏。
+    截止时间统一登记在 DeadlineService 中，不再为每个阶段挂一个睡眠任务。
+    """
+
+    def __init__(self, service: Optional[DeadlineService] = None):
+        self.service = service or get_default_service()
+        self._handle: Optional[TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+        self._phase: Optional[GamePhase] = None
+        self._callback: Optional[Callable[[], Awaitable[None]]] = None
+        self._armed_at = 0.0
+
+    @property
+    def armed_phase(self) -> Optional[GamePhase]:
+        """当前挂着定时器的阶段"""
+        return self._phase
+
+    @property
+    def deadline(self) -> Optional[float]:
+        """当前阶段的截止时间（service.clock 时间）"""
+        return self._handle.when if self._handle is not None and self._handle.active else None
+
+    def remaining(self) -> Optional[float]:
+        """当前阶段剩余秒数"""
+        deadline = self.deadline
+        return None if deadline is None else max(0.0, deadline - self.service.clock())
+
+    def arm(self, phase: GamePhase, delay: float, callback: Callable[[], Awaitable[None]]):
+        """为阶段设置超时回调"""
+        self._stop()
+        self._phase = phase
+        self._callback = callback
+        self._armed_at = self.service.clock()
+        handle = None
+
+        def fire():
+            if self._handle is handle:
+                self._start_callback("timeout")
+
+        handle = self.service.schedule(self._armed_at + delay, fire)
+        self._handle = handle
+
+    def advance(self, phase: GamePhase) -> bool:
+        """提前结束阶段，phase 与当前挂着的阶段不一致时忽略"""
+        if self._phase != phase or self._callback is None:
+            return False
+        self._start_callback("early")
+        return True
+
+    def reschedule(self, phase: GamePhase, timeout: float) -> bool:
+        """阶段时长改为 timeout 秒（从阶段开始时算起）"""
+        if self._phase != phase or self._handle is None:
+            return False
+        self.service.reschedule(self._handle, max(self._armed_at + timeout, self.service.clock()))
+        return True
+
+    def cancel(self):
+        """取消当前阶段的定时器以及正在执行的阶段回调"""
+        self._stop()
+        self._phase = None
+        self._callback = None
+
+    def _start_callback(self, reason: str):
+        callback = self._callback
+        label = phase_label(self._phase)
+        PHASE_ENDINGS.inc(label, reason)
+        PHASE_SECONDS.observe(self.service.clock() - self._armed_at, label)
+        if self._handle is not None:
+            self.service.cancel(self._handle)
+            self._handle = None
+        self._phase = None
+        self._callback = None
+        self._task = asyncio.create_task(self._run(callback))
+
+    def _stop(self):
+        if self._handle is not None:
+            self.service.cancel(self._handle)
+            self._handle = None
+        # 回调内部会进入下一阶段并重新 arm，此时不能取消正在执行回调的自身任务
+        task = self._task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+            self._task = None
+
+    async def _run(self, callback: Callable[[], Awaitable[None]]):
+        try:
+            await callback()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[挂科狼人杀] 阶段回调执行失败: {e}", exc_info=True)
@@ -0,0 +1,818 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+
+from .dispatch import DeliveryResult
+from .engine import GameEngine, RuleError
+from .flood import FloodGuard
+from .index import PlayerIndex
+from .journal import GameJournal, file_stem
+from .lifecycle import estimate_size
+from .metrics import GAMES_FINISHED, PROCESSING_SECONDS
+from .models import DeathCause, GamePhase, Player, WEREWOLF_ROLES
+from .night import describe_action
+from .outbox import GroupOutbox
+from .scheduler import PhaseScheduler
+from .settings import GameSettings
+from .stats import StatsStore
+from .tally import VoteTally
+from . import templates
+from .tracing import NULL_TRACER, Tracer, traced
+from .timers import DeadlineService
+
+# 与 astrbot.api.logger 为同一个 logger，这里不直接依赖 AstrBot 以便脱离框架运行
+logger = logging.getLogger("astrbot")
+
+
+class GameSession:
+    """单个群聊中的一局游戏
+
+    规则全部由 GameEngine 结算，本类只负责收发消息和安排阶段定时器。
+    messenger 需要提供 send_private(user_id, content)、
+    send_group(group_id, content) 与 send_private_many(messages) 三个协程方法
+    （见 dispatch.FanoutMessenger），单条发送失败时抛出异常。
+    """
+
+    def __init__(
+        self,
+        group_id: str,
+        settings: GameSettings,
+        messenger,
+        registry: Optional["SessionRegistry"] = None,
+        deadlines: Optional[DeadlineService] = None,
+        rng: Optional[random.Random] = None,
+        journal: Optional[GameJournal] = None,
+        stats: Optional[StatsStore] = None,
+        tracer: Optional[Tracer] = None,
+    ):
+        self.group_id = group_id
+        self.settings = settings
+        self.messenger = messenger
+        self.registry = registry
+        # 群消息出站队列：短时间内的消息合并发送
+        self.outbox = GroupOutbox(self._deliver_group_message, window=settings.group_merge_window)
+        # 玩家指令限频：丢弃连发的重复指令和超频指令
+        self.flood = FloodGuard(settings.command_rate, settings.command_burst, settings.repeat_window)
+        # 阶段定时器：每个房间只保留一个可取消的句柄
+        self.scheduler = PhaseScheduler(deadlines)
+
+        # 规则引擎持有全部对局状态
+        self.engine = GameEngine(settings, rng)
+        self.game_master = None  # 游戏主持人
+
+        # 崩溃恢复日志：引擎的状态变化先进缓冲区，阶段切换时批量落盘
+        self.journal = journal
+        if journal is not None:
+            self.engine.recorder = journal.record
+        self._deadline: Optional[Dict[str, Any]] = None  # 当前阶段截止时间（墙上时间，用于重启后恢复）
+        self.stats = stats  # 战绩存储
+        self.tracer = tracer or NULL_TRACER  # 追踪（默认关闭）
+
+        # 等待玩家输入的选择（如助教带走目标）：user_id -> future
+        self._choices: Dict[str, asyncio.Future] = {}
+
+        # 存活名单缓存，玩家索引变化（出局/报名）后失效
+        self._roster = ""
+        self._roster_version = -1
+
+        # 最近一次收到指令或进入新阶段的时间（time.monotonic），用于回收空闲房间
+        self.last_active = time.monotonic()
+
+    @property
+    def game_phase(self) -> GamePhase:
+        return self.engine.phase
+
+    @property
+    def day_count(self) -> int:
+        return self.engine.day_count
+
+    @property
+    def index(self) -> PlayerIndex:
+        return self.engine.index
+
+    @property
+    def players(self) -> Dict[str, Player]:
+        return self.engine.players
+
+    @property
+    def tally(self) -> VoteTally:
+        return self.engine.tally
+
+    @property
+    def night_actors(self) -> Set[str]:
+        return self.engine.night_actors
+
+    async def _send_private_message(self, user_id: str, content: str):
+        """发送私聊消息"""
+        if not self.settings.enable_private_chat:
+            return
+        try:
+            await self.messenger.send_private(user_id, content)
+        except Exception as e:
+            logger.error(f"[挂科狼人杀] 发送私聊消息失败: {e}")
+
+    async def _send_group_message(self, content: str, key: Optional[str] = None):
+        """发送群聊消息（进入出站队列，key 相同的未发出消息会被替换）"""
+        if not self.group_id:
+            return
+        self.outbox.post(content, key)
+
+    async def _deliver_group_message(self, content: str):
+        """实际发送群聊消息"""
+        try:
+            await self.messenger.send_group(self.group_id, content)
+        except Exception as e:
+            logger.error(f"[挂科狼人杀] 发送群聊消息失败: {e}")
+
+    async def _send_private_messages(self, messages: List[Tuple[str, str]]) -> Dict[str, DeliveryResult]:
+        """并发发送多条私聊，返回每个收件人的投递结果"""
+        if not self.settings.enable_private_chat or not messages:
+            return {}
+        results = await self.messenger.send_private_many(messages)
+        for result in results.values():
+            if not result.ok:
+                logger.error(
+                    f"[挂科狼人杀] 发送私聊消息失败({result.user_id}，尝试{result.attempts}次): {result.error}"
+                )
+        return results
+
+    async def _broadcast_to_players(self, content: str, exclude: List[str] = None):
+        """向所有存活玩家广播消息"""
+        exclude = exclude or []
+        await self._send_private_messages([
+            (player.user_id, content)
+            for player in self.index.alive_players()
+            if player.user_id not in exclude
+        ])
+
+    # 各阶段的超时回调
+    PHASE_CALLBACKS = {
+        GamePhase.REGISTERING: "_registration_timeout",
+        GamePhase.NIGHT: "_night_timeout",
+        GamePhase.DAY: "_day_timeout",
+        GamePhase.VOTING: "_vote_timeout",
+    }
+
+    async def _arm(self, phase: GamePhase, delay: float, snapshot: bool = False):
+        """设置阶段超时，并把截止时间与本阶段的状态变化落盘"""
+        self.scheduler.arm(phase, delay, getattr(self, self.PHASE_CALLBACKS[phase]))
+        if self.registry is not None:
+            self.registry.touch(self)
+        self._deadline = {"op": "deadline", "phase": phase.name, "at": time.time() + delay}
+        if self.journal is None:
+            return
+        with self.tracer.span("journal", snapshot=snapshot):
+            if snapshot:
+                await self.journal.snapshot(self._snapshot_state())
+            else:
+                self.journal.record(self._deadline)
+                await self.journal.commit()
+
+    def _snapshot_state(self) -> Dict[str, Any]:
+        """房间的完整快照"""
+        return {
+            "group_id": self.group_id,
+            "game_master": self.game_master,
+            "timeouts": {attr: getattr(self.settings, attr) for attr, _ in self.TIMEOUT_SETTINGS.values()},
+            "deadline": self._deadline,
+            "engine": self.engine.snapshot(),
+        }
+
+    async def resume(self, state: Dict[str, Any], events: List[Dict[str, Any]]) -> bool:
+        """从快照与日志恢复重启前未结束的游戏，返回是否恢复成功"""
+        self.game_master = state.get("game_master")
+        for attr, seconds in state.get("timeouts", {}).items():
+            setattr(self.settings, attr, seconds)
+        deadline = state.get("deadline")
+        self.engine.restore(state["engine"])
+        for event in events:
+            op = event.get("op")
+            if op == "deadline":
+                deadline = event
+            elif op == "timeout":
+                setattr(self.settings, event["attr"], event["seconds"])
+            else:
+                self.engine.apply(event)
+
+        phase = self.game_phase
+        if phase not in self.PHASE_CALLBACKS:
+            # 已结束或尚未开始的游戏不需要恢复
+            if self.journal is not None:
+                await self.journal.discard()
+            return False
+
+        if self.registry is not None:
+            for user_id in self.players:
+                self.registry.bind_user(user_id, self)
+
+        if phase == GamePhase.NIGHT and self.day_count == 0:
+            # 已发牌但第一夜还没开始（重启前正在私聊身份）：补发身份后进入第一夜
+            await self._send_group_message("♻️ 机器人已重启，本群的游戏已恢复，身份保持不变，重新私聊身份后进入第一夜")
+            await self.outbox.flush()
+            await self._send_role_cards(self.index.seats)
+            await self.start_night()
+            return True
+
+        if deadline and deadline.get("phase") == phase.name:
+            delay = max(0.0, deadline["at"] - time.time())
+        else:
+            delay = getattr(self.settings, self.PHASE_TIMEOUTS[phase])
+
+        await self._send_group_message(
+            f"♻️ 机器人已重启，本群的游戏已恢复\n"
+            f"🎮 当前阶段：{phase.value}" + (f"（第{self.day_count}天）" if self.day_count else "") + "\n"
+            f"⏰ 本阶段剩余{int(delay)}秒"
+        )
+        await self.outbox.flush()
+        await self._arm(phase, delay, snapshot=True)
+        return True
+
+    async def start_registration(self, master_id: str):
+        """开始报名"""
+        try:
+            self.engine.open_registration()
+        except RuleError as e:
+            await self._send_group_message(f"❌ {e}")
+            return
+
+        self.game_master = master_id
+
+        await self._send_group_message(templates.REGISTRATION_OPEN.format(
+            master=master_id,
+            min_players=self.settings.min_players,
+            max_players=self.settings.max_players,
+            minutes=self.settings.registration_timeout // 60,
+        ))
+        await self.outbox.flush()
+
+        # 设置报名超时
+        await self._arm(GamePhase.REGISTERING, self.settings.registration_timeout, snapshot=True)
+
+    async def _registration_timeout(self):
+        """报名超时（或报名已满）"""
+        if self.game_phase == GamePhase.REGISTERING:
+            if self.engine.registered_count >= self.settings.min_players:
+                await self.start_game()
+            else:
+                await self._send_group_message(
+                    f"⏰ 报名时间结束，报名人数不足{self.settings.min_players}人，游戏取消"
+                )
+                await self.outbox.flush()
+                self.reset_game()
+
+    async def register_player(self, user_id: str, user_name: str):
+        """玩家报名"""
+        try:
+            self.engine.check_registration(user_id, user_name)
+        except RuleError as e:
+            await self._send_private_message(user_id, f"❌ {e}")
+            return
+
+        if self.registry is not None and not self.registry.bind_user(user_id, self):
+            await self._send_private_message(user_id, "❌ 你已经在其他群的游戏中了")
+            return
+
+        self.engine.add_player(user_id, user_name, self.group_id)
+        if self.journal is not None:
+            await self.journal.commit()
+        count = self.engine.registered_count
+
+        await self._send_group_message(
+            templates.REGISTERED_GROUP.format(name=user_name, count=count, max_players=self.settings.max_players)
+        )
+        await self._send_private_message(user_id, templates.REGISTERED_PRIVATE.format(count=count))
+
+        # 报名已满，直接开始
+        if self.engine.registration_full:
+            self.scheduler.advance(GamePhase.REGISTERING)
+
+    async def request_start(self):
+        """主持人提前开始游戏
+
+        开局（发牌、私聊身份、进入第一夜）交给阶段定时器作为报名阶段的回调执行，
+        与报名超时、报名已满走同一条路径：取消游戏时 scheduler.cancel() 会一并取消
+        正在进行的开局，不会在已重置的房间上继续进入夜晚。
+        """
+        if self.game_phase != GamePhase.REGISTERING:
+            return
+        if self.engine.registered_count < self.settings.min_players:
+            await self._send_group_message(f"❌ 报名人数不足{self.settings.min_players}人，无法开始游戏")
+            return
+        self.scheduler.advance(GamePhase.REGISTERING)
+
+    @traced("start_game")
+    async def start_game(self):
+        """开始游戏（由报名阶段的回调调用）"""
+        if self.game_phase != GamePhase.REGISTERING:
+            return
+
+        try:
+            seated = self.engine.start_game()
+        except RuleError as e:
+            await self._send_group_message(f"❌ {e}")
+            return
+        # 发牌结果先落盘：私聊身份期间崩溃时，重启后沿用这次发牌，不会重新发牌
+        if self.journal is not None:
+            await self.journal.commit()
+
+        # 通知玩家角色
+        await self._send_group_message(templates.GAME_START.format(count=len(seated), day=self.day_count + 1))
+        await self.outbox.flush()
+        await self._send_role_cards(seated)
+
+        # 开始第一夜
+        await self.start_night()
+
+    async def _send_role_cards(self, seated: List[Player]):
+        """私聊每名玩家的身份（身份卡按角色预渲染）"""
+        role_cards = []
+        for player in seated:
+            # 如果是挂科生，告诉他们同伙
+            if player.role in WEREWOLF_ROLES:
+                teammates = "、".join(p.user_name for p in self.engine.teammates(player)) or "无"
+                card = templates.role_card_with_teammates(player.role, teammates)
+            else:
+                card = templates.role_card(player.role)
+            role_cards.append((player.user_id, card))
+        await self._send_private_messages(role_cards)
+
+    @traced("start_night")
+    async def start_night(self):
+        """开始夜晚阶段"""
+        actors = self.engine.begin_night()
+
+        # 先设置夜晚超时（每晚写一次快照压缩日志）：发送提示期间已可能有人行动，
+        # 所有人行动完毕时需要有定时器可以提前结束
+        await self._arm(GamePhase.NIGHT, self.settings.night_timeout, snapshot=True)
+
+        day, timeout = self.day_count, self.settings.night_timeout
+        await self._send_group_message(templates.NIGHT_START.format(day=day, timeout=timeout))
+        await self.outbox.flush()
+
+        # 通知有夜晚行动的玩家（同一角色的提示只渲染一次）
+        rendered = {}
+        prompts = []
+        for player in actors:
+            text = rendered.get(player.role)
+            if text is None:
+                text = rendered[player.role] = templates.night_prompt(player.role).format(day=day, timeout=timeout)
+            prompts.append((player.user_id, text))
+        await self._send_private_messages(prompts)
+
+    async def _night_timeout(self):
+        """夜晚超时（或所有玩家已行动）"""
+        if self.game_phase == GamePhase.NIGHT:
+            await self.process_night_actions()
+
+    @traced("process_night_actions")
+    async def process_night_actions(self):
+        """处理夜晚行动结果"""
+        with PROCESSING_SECONDS.time("night"):
+            await self._process_night_actions()
+
+    async def _process_night_actions(self):
+        result = self.engine.resolve_night()
+
+        # “天亮了”与夜晚结果在出站队列中合并为一条
+        await self._send_group_message("🌅 天亮了！")
+        for player in result.saved:
+            await self._send_group_message(f"💊 任课老师使用平时成绩救了{player.user_name}！")
+
+        # 公布夜晚结果
+        parts = [f"🌅 第{self.day_count}天夜晚结束"]
+        if result.killed:
+            parts.append("📉 昨晚挂科的学生：" + "、".join(p.user_name for p in result.killed))
+            if self.settings.show_role_death:
+                parts.extend(f"  - {p.user_name} 的身份是 {p.role.value}" for p in result.killed)
+        else:
+            parts.append("🎉 昨晚是平安夜，没有学生挂科")
+        if result.poisoned:
+            parts.append("🧪 被任课老师挂科：" + "、".join(p.user_name for p in result.poisoned))
+        if result.protected:
+            parts.append("🛡️ 被奖学金保护：" + "、".join(p.user_name for p in result.protected))
+        if result.silenced:
+            parts.append("🤐 今天被图书馆管理员禁言：" + "、".join(p.user_name for p in result.silenced))
+
+        await self._send_group_message("\n".join(parts))
+
+        # 查验结果、情侣等私聊通知
+        if result.notices:
+            await self._send_private_messages(result.notices)
+
+        # 统一出局（含殉情、助教带走等连锁出局）
+        for player in result.killed:
+            await self.eliminate(player, DeathCause.NIGHT_KILL)
+        for player in result.poisoned:
+            await self.eliminate(player, DeathCause.POISON)
+
+        # 检查游戏是否结束
+        if self.check_game_end():
+            return
+
+        # 进入白天阶段
+        await self.start_day()
+
+    @traced("start_day")
+    async def start_day(self):
+        """开始白天阶段"""
+        self.engine.begin_day()
+
+        await self._send_group_message(templates.DAY_START.format(day=self.day_count, timeout=self.settings.day_timeout))
+        await self.outbox.flush()
+
+        # 设置白天超时
+        await self._arm(GamePhase.DAY, self.settings.day_timeout)
+
+    async def _day_timeout(self):
+        """白天超时"""
+        if self.game_phase == GamePhase.DAY:
+            await self.start_voting()
+
+    @traced("start_voting")
+    async def start_voting(self):
+        """开始投票阶段"""
+        self.engine.begin_vote()
+
+        # 先设置投票超时，发送提示期间投出的票也能提前结束投票
+        await self._arm(GamePhase.VOTING, self.settings.vote_timeout)
+
+        await self._send_group_message(
+            templates.VOTE_START.format(roster=self.alive_roster(), timeout=self.settings.vote_timeout)
+        )
+        await self.outbox.flush()
+
+    async def _vote_timeout(self):
+        """投票超时（或投票结果已确定）"""
+        if self.game_phase == GamePhase.VOTING:
+            await self.process_votes()
+
+    @traced("process_votes")
+    async def process_votes(self):
+        """处理投票结果"""
+        with PROCESSING_SECONDS.time("vote"):
+            await self._process_votes()
+
+    async def _process_votes(self):
+        # 票数在投票时已增量统计
+        result = self.engine.resolve_votes()
+        if result.tied:
+            # 平票，无人被淘汰
+            tied_names = "、".join([p.user_name for p in result.tied])
+            await self._send_group_message(f"⚖️ 平票！{tied_names} 得票相同，无人被淘汰")
+
+        # 处理淘汰
+        lynched_player = result.lynched
+        if lynched_player:
+            await self._send_group_message(
+                f"🚨 {lynched_player.user_name} 被投票退学！\n"
+                f"身份是：{lynched_player.role.value}"
+            )
+            await self.eliminate(lynched_player, DeathCause.VOTE)
+
+        # 检查游戏是否结束
+        if self.check_game_end():
+            return
+
+        # 进入下一夜
+        await self.start_night()
+
+    async def eliminate(self, player: Player, cause: DeathCause) -> List[Player]:
+        """淘汰玩家并处理连锁出局，返回本次出局的全部玩家
+
+        出局与情侣殉情由引擎结算；可以发动技能的助教在这里逐个询问目标。
+        """
+        eliminated = []
+        deaths = self.engine.eliminate(player, cause)
+        while True:
+            for death in deaths:
+                eliminated.append(death.player)
+                if death.cause in (DeathCause.LOVER, DeathCause.TAKEN):
+                    message = f"💀 {death.player.user_name} {death.cause.value}"
+                    if self.settings.show_role_death:
+                        message += f"，身份是 {death.player.role.value}"
+                    await self._send_group_message(message)
+
+            shooter = self.engine.next_shooter()
+            if shooter is None:
+                break
+            target = await self._handle_teaching_assistant_skill(shooter)
+            deaths = self.engine.shoot(shooter, target) if target else []
+        return eliminated
+
+    @traced("teaching_assistant_skill")
+    async def _handle_teaching_assistant_skill(self, ta_player: Player) -> Optional[Player]:
+        """等待助教用 /带走 选择目标，超时则随机带走一名存活玩家"""
+        candidates = self.engine.shoot_candidates(ta_player)
+        if not candidates:
+            return None
+        timeout = self.settings.take_timeout
+        await self._send_group_message(templates.TEACHING_ASSISTANT_PROMPT.format(name=ta_player.user_name, timeout=timeout))
+        await self.outbox.flush()
+
+        target = await self._await_choice(ta_player.user_id, timeout)
+        if target is None:
+            target = self.engine.rng.choice(candidates)
+            await self._send_group_message(f"⏰ {ta_player.user_name} 没有在{timeout}秒内做出选择，随机带走一名学生")
+        await self._send_group_message(f"💥 {ta_player.user_name} 带走了 {target.user_name}！")
+        return target
+
+    async def _await_choice(self, user_id: str, timeout: float) -> Optional[Any]:
+        """等待玩家的选择，返回 _choices 中 future 的结果，超时返回 None"""
+        future = asyncio.get_running_loop().create_future()
+        self._choices[user_id] = future
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            if self._choices.get(user_id) is future:
+                del self._choices[user_id]
+
+    @property
+    def pending_choices(self) -> List[str]:
+        """正在等待输入选择的玩家"""
+        return list(self._choices)
+
+    async def handle_take(self, user_id: str, target_name: str):
+        """处理助教的 /带走，选择有效时立即继续结算"""
+        future = self._choices.get(user_id)
+        shooter = self.index.get(user_id)
+        if future is None or future.done() or shooter is None:
+            await self._send_private_message(user_id, "❌ 现在不能发动带走技能")
+            return
+        try:
+            target = self.engine.find_shoot_target(shooter, target_name)
+        except RuleError as e:
+            await self._send_private_message(user_id, f"❌ {e}")
+            return
+        future.set_result(target)
+
+    def check_game_end(self) -> bool:
+        """检查游戏是否结束（已被重置、没有玩家的房间不会结束）"""
+        winner = self.engine.check_winner()
+        if winner is None:
+            return False
+        asyncio.create_task(self.end_game(winner.value))
+        return True
+
+    @traced("end_game")
+    async def end_game(self, winner: str):
+        """结束游戏"""
+        # 先取下本局结果：下面的发送期间房间可能被取消或回收，引擎随之清空
+        players = list(self.players.values())
+        survivors = [p.user_id for p in self.index.alive_players()]
+        camp, days = self.engine.winner, self.day_count
+        if not players:
+            return
+
+        # 显示所有玩家身份
+        parts = [f"🎉 游戏结束！{winner}胜利！\n\n📊 玩家身份："]
+        alive = set(survivors)
+        parts.extend(f"{'✅' if p.user_id in alive else '❌'} {p.user_name}: {p.role.value}" for p in players)
+        parts.append(templates.GAME_END_FOOTER)
+
+        await self._send_group_message("\n".join(parts))
+        await self.outbox.flush()
+
+        # 记录战绩
+        GAMES_FINISHED.inc(camp.name.lower() if camp else "none")
+        if self.stats is not None:
+            await self.stats.record_game(self.group_id, camp, days, players, survivors)
+        await self.export_trace()
+        self.reset_game()
+
+    async def export_trace(self) -> Optional[str]:
+        """把本局的追踪写成 Chrome trace 文件，返回文件路径（未开启追踪时返回 None）"""
+        if not self.tracer.directory:
+            return None
+        path = os.path.join(
+            self.tracer.directory, f"{file_stem(self.group_id)}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self.tracer.export, path)
+        except OSError as e:
+            logger.error(f"[挂科狼人杀] 导出追踪失败: {e}")
+            return None
+        return path
+
+    def memory_usage(self) -> int:
+        """本房间状态占用的内存估算（字节）"""
+        return estimate_size(self.engine, self.outbox, self.journal, self.tracer, self._choices, self.settings)
+
+    def reset_game(self):
+        """重置游戏，并从房间注册表中移除本局"""
+        self.scheduler.cancel()
+        if self.journal is not None:
+            asyncio.create_task(self.journal.discard())
+        if self.registry is not None:
+            self.registry.remove(self.group_id, self)
+
+        self.engine.reset()
+        self.game_master = None
+
+    # 可在游戏中调整的阶段时长：指令名称 -> (配置项, 对应阶段)
+    TIMEOUT_SETTINGS = {
+        "报名": ("registration_timeout", GamePhase.REGISTERING),
+        "夜晚": ("night_timeout", GamePhase.NIGHT),
+        "白天": ("day_timeout", GamePhase.DAY),
+        "投票": ("vote_timeout", GamePhase.VOTING),
+    }
+
+    # 阶段 -> 时长配置项
+    PHASE_TIMEOUTS = {phase: attr for attr, phase in TIMEOUT_SETTINGS.values()}
+
+    async def update_timeout(self, name: str, seconds: int):
+        """修改本房间的阶段时长，当前阶段的截止时间随之调整"""
+        setting = self.TIMEOUT_SETTINGS.get(name)
+        if setting is None:
+            await self._send_group_message(
+                f"❌ 未知的阶段：{name}，可选：{'、'.join(self.TIMEOUT_SETTINGS)}"
+            )
+            return
+        if not 10 <= seconds <= 3600:
+            await self._send_group_message("❌ 阶段时长需在10-3600秒之间")
+            return
+
+        attr, phase = setting
+        setattr(self.settings, attr, seconds)
+        message = f"⚙️ {name}时长已设置为{seconds}秒"
+        if self.journal is not None:
+            self.journal.record({"op": "timeout", "attr": attr, "seconds": seconds})
+        if self.scheduler.reschedule(phase, seconds):
+            remaining = self.scheduler.remaining()
+            self._deadline = {"op": "deadline", "phase": phase.name, "at": time.time() + remaining}
+            if self.journal is not None:
+                self.journal.record(self._deadline)
+            message += f"，本阶段剩余{int(remaining)}秒"
+        await self._send_group_message(message)
+        if self.journal is not None:
+            await self.journal.commit()
+
+    def get_player_by_name(self, name: str) -> Optional[Player]:
+        """通过玩家名称（或前缀、座位号、@ 提及）获取玩家对象"""
+        try:
+            return self.index.resolve(name)
+        except RuleError:
+            return None
+
+    async def handle_night_action(self, user_id: str, action: str):
+        """处理夜晚行动"""
+        try:
+            parsed, complete = self.engine.submit_night_action(user_id, action)
+        except RuleError as e:
+            await self._send_private_message(user_id, f"❌ {e}")
+            return
+
+        await self._send_private_message(user_id, f"✅ 你的行动已记录：{describe_action(self.engine, parsed)}")
+
+        # 所有需要行动的玩家都已行动，提前天亮
+        if complete:
+            self.scheduler.advance(GamePhase.NIGHT)
+
+    async def handle_vote(self, voter_id: str, target_name: str):
+        """处理投票"""
+        try:
+            target, previous, decided = self.engine.cast_vote(voter_id, target_name)
+        except RuleError as e:
+            await self._send_private_message(voter_id, f"❌ {e}")
+            return
+
+        if previous is not None:
+            await self._send_private_message(
+                voter_id, f"✅ 你已从 {previous.user_name} 改投给 {target.user_name}"
+            )
+        else:
+            await self._send_private_message(voter_id, f"✅ 你已投票给 {target.user_name}")
+
+        # 广播投票情况
+        vote_count = len(self.tally)
+        alive_count = self.index.alive_count
+        await self._send_group_message(f"🗳️ 投票进度：{vote_count}/{alive_count}", key="vote_progress")
+
+        # 剩余选票已无法改变结果，提前结束投票
+        if decided:
+            self.scheduler.advance(GamePhase.VOTING)
+
+    async def handle_speech(self, user_id: str, content: str):
+        """处理发言"""
+        try:
+            player = self.engine.check_speaker(user_id)
+        except RuleError as e:
+            await self._send_private_message(user_id, f"❌ {e}")
+            return
+
+        # 广播发言
+        await self._send_group_message(f"🗣️ {player.user_name}：{content}")
+
+    async def show_game_status(self):
+        """显示游戏状态"""
+        if self.game_phase == GamePhase.WAITING:
+            await self._send_group_message("🕐 游戏未开始")
+            return
+
+        parts = [f"🎮 游戏状态：{self.game_phase.value}"]
+
+        if self.game_phase == GamePhase.REGISTERING:
+            parts.append(f"👥 已报名：{self.engine.registered_count}人")
+            parts.append(f"⏰ 最少{self.settings.min_players}人开始游戏")
+
+        elif self.game_phase in [GamePhase.NIGHT, GamePhase.DAY, GamePhase.VOTING]:
+            parts.append(f"📅 第{self.day_count}天")
+
+            # 存活玩家
+            parts.append(f"✅ 存活：{self.index.alive_count}人")
+            if self.index.alive_count:
+                parts.append("  " + self.alive_roster())
+
+            parts.append(f"❌ 挂科：{self.index.dropped_count}人")
+            if self.index.dropped_count and self.settings.show_role_death:
+                parts.append("  " + "、".join(f"{p.user_name}({p.role.value})" for p in self.index.dropped_players()))
+
+        await self._send_group_message("\n".join(parts))
+
+    def alive_roster(self) -> str:
+        """存活玩家名单（缓存到下一次出局）"""
+        if self._roster_version != self.index.version:
+            self._roster = "、".join(f"{p.seat + 1}号{p.user_name}" for p in self.index.alive_players())
+            self._roster_version = self.index.version
+        return self._roster
+
+
+class SessionRegistry:
+    """按群号索引的房间注册表，一个插件实例可同时托管多个群的游戏"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[str, "SessionRegistry"], GameSession],
+        on_bind: Optional[Callable[[str, bool], None]] = None,
+        on_room: Optional[Callable[[str, bool], None]] = None,
+    ):
+        self._session_factory = session_factory
+        self._sessions: "OrderedDict[str, GameSession]" = OrderedDict()  # group_id -> 房间（最久未活动的在前）
+        self._user_sessions: Dict[str, GameSession] = {}  # user_id -> 所在房间
+        # 玩家绑定/解绑时回调 (user_id, 是否绑定)，多进程模式下用于把私聊路由到对应进程
+        self._on_bind = on_bind
+        # 房间创建/移除时回调 (group_id, 是否存在)，多进程模式下插件进程据此只转发有房间的群的消息
+        self._on_room = on_room
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, group_id: str) -> bool:
+        return group_id in self._sessions
+
+    def get(self, group_id: str) -> Optional[GameSession]:
+        """获取群聊对应的房间"""
+        return self._sessions.get(group_id)
+
+    def create(self, group_id: str) -> GameSession:
+        """为群聊创建房间，已存在时直接返回"""
+        session = self._sessions.get(group_id)
+        if session is None:
+            session = self._session_factory(group_id, self)
+            self._sessions[group_id] = session
+            if self._on_room is not None:
+                self._on_room(group_id, True)
+        return session
+
+    def touch(self, session: GameSession):
+        """刷新房间的活跃时间"""
+        session.last_active = time.monotonic()
+        if self._sessions.get(session.group_id) is session:
+            self._sessions.move_to_end(session.group_id)
+
+    def remove(self, group_id: str, session: Optional[GameSession] = None):
+        """移除房间并解除玩家绑定"""
+        current = self._sessions.get(group_id)
+        if current is None or (session is not None and current is not session):
+            return
+        del self._sessions[group_id]
+        if self._on_room is not None:
+            self._on_room(group_id, False)
+        for user_id in list(current.players):
+            if self._user_sessions.get(user_id) is current:
+                del self._user_sessions[user_id]
+                if self._on_bind is not None:
+                    self._on_bind(user_id, False)
+
+    def bind_user(self, user_id: str, session: GameSession) -> bool:
+        """把玩家绑定到房间，玩家已在其他房间时返回 False"""
+        current = self._user_sessions.get(user_id)
+        if current is not None and current is not session:
+            return False
+        self._user_sessions[user_id] = session
+        if current is None and self._on_bind is not None:
+            self._on_bind(user_id, True)
+        return True
+
+    def find_by_user(self, user_id: str) -> Optional[GameSession]:
+        """查找玩家所在的房间（用于私聊指令）"""
+        return self._user_sessions.get(user_id)
+
+    def sessions(self) -> List[GameSession]:
+        return list(self._sessions.values())
@@ -0,0 +1,58 @@
+from typing import Dict
+from dataclasses import dataclass, field
+
+
+def _default_roles() -> Dict[str, int]:
+    return {
+        "bad_student": 0,  # 挂科生数量（0 表示按人数自动决定）
+        "academic_affairs": 1,  # 教务处
+        "teacher": 1,  # 任课老师
+        "scholarship": 1,  # 奖学金
+        "teaching_assistant": 1,  # 助教
+        "exchange_student": 0,  # 交换生 (可选)
+        "repeater": 0,  # 重修生 (可选)
+        "academic_warning": 0,  # 学业预警 (可选)
+        "librarian": 0,  # 图书馆管理员 (可选)
+        "student_union": 0,  # 学生会主席 (可选)
+        "cheater": 0,  # 作弊者 (可选)
+    }
+
+
+@dataclass
+class GameSettings:
+    """单局游戏配置（每个房间持有一份拷贝）"""
+    min_players: int = 6
+    max_players: int = 12
+    registration_timeout: int = 120  # 报名时间(秒)
+    night_timeout: int = 120  # 夜晚时间(秒)
+    day_timeout: int = 180  # 白天时间(秒)
+    vote_timeout: int = 60  # 投票时间(秒)
+    take_timeout: int = 30  # 助教选择带走目标的时间(秒)
+    enable_private_chat: bool = True
+    show_role_death: bool = True
+    allow_revote: bool = False
+    group_merge_window: float = 1.0  # 群消息合并窗口(秒)
+    command_rate: float = 1.0  # 每个玩家每秒可发的指令数（0 为不限制）
+    command_burst: int = 5  # 允许连续发送的指令数
+    repeat_window: float = 3.0  # 多少秒内重复的同一指令只处理一次
+    roles_config: Dict[str, int] = field(default_factory=_default_roles)
+
+    @classmethod
+    def from_config(cls, config) -> "GameSettings":
+        """从插件配置读取"""
+        return cls(
+            min_players=config.get("min_players", 6),
+            max_players=config.get("max_players", 12),
+            night_timeout=config.get("night_timeout", 120),
+            day_timeout=config.get("day_timeout", 180),
+            vote_timeout=config.get("vote_timeout", 60),
+            take_timeout=config.get("take_timeout", 30),
+            enable_private_chat=config.get("enable_private_chat", True),
+            show_role_death=config.get("show_role_death", True),
+            allow_revote=config.get("allow_revote", False),
+            group_merge_window=config.get("group_merge_window", 1.0),
+            command_rate=config.get("command_rate", 1.0),
+            command_burst=config.get("command_burst", 5),
+            repeat_window=config.get("repeat_window", 3.0),
+            roles_config=dict(config.get("roles", _default_roles())),
+        )
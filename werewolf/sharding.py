@@ -0,0 +1,298 @@
+"""多进程分片：按群号把房间分配到若干工作进程
+
+每个工作进程运行一个 WerewolfApp，独占分配给它的群的全部房间状态；插件进程只负责
+按群号转发消息，并代各工作进程发送消息（限速与重试仍在插件进程统一进行，
+对应平台对单个账号的整体发送频率限制）。
+
+按进程划分的状态：max_sessions 按进程数平均分给各工作进程；房间、战绩查询缓存和
+指令/阶段等指标属于各自的工作进程（写到 metrics-<序号>.prom），代发消息的耗时、
+失败与重复投递等指标属于插件进程（写到 metrics.prom）。
+
+进程间消息（均为 tuple，经 multiprocessing.Queue 传递）：
+  插件 -> 工作进程：("event", IncomingMessage) / ("ack", req_id, error) / ("stop",)
+  工作进程 -> 插件：("send", worker, req_id, kind, target, content) / ("bind", worker, user_id, bound)
+                   / ("room", worker, group_id, opened)
+"""
+import os
+import math
+import asyncio
+import logging
+import threading
+import multiprocessing
+import zlib
+from typing import Dict, List, Optional, Set
+
+from .app import IncomingMessage, WerewolfApp
+from .dispatch import FanoutMessenger
+from .flood import RecentIds
+from .journal import DEFAULT_DATA_DIR
+from .metrics import REGISTRY
+
+logger = logging.getLogger("astrbot")
+
+
+def shard_for(key: str, count: int) -> int:
+    """群号（或用户号）对应的工作进程序号，跨进程、跨重启保持稳定"""
+    return zlib.crc32(key.encode("utf-8")) % count
+
+
+class RelayError(Exception):
+    """插件进程代发消息失败"""
+
+
+class RelayMessenger:
+    """工作进程侧的 messenger：把发送请求交给插件进程，等待其确认"""
+
+    def __init__(self, index: int, outbox):
+        self.index = index
+        self.outbox = outbox
+        self._next_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    async def send_private(self, user_id: str, content: str):
+        await self._relay("private", user_id, content)
+
+    async def send_group(self, group_id: str, content: str):
+        await self._relay("group", group_id, content)
+
+    async def _relay(self, kind: str, target: str, content: str):
+        self._next_id += 1
+        req_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        try:
+            self.outbox.put(("send", self.index, req_id, kind, target, content))
+            await future
+        finally:
+            self._pending.pop(req_id, None)
+
+    def ack(self, req_id: int, error: Optional[str]):
+        """收到插件进程的发送结果"""
+        future = self._pending.get(req_id)
+        if future is None or future.done():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(RelayError(error))
+
+    def fail_all(self, error: str):
+        """插件进程停止时让所有等待中的发送失败"""
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(RelayError(error))
+
+
+def _read_queue(source, loop: asyncio.AbstractEventLoop, handler):
+    """在线程中阻塞读取队列，把每一项交给事件循环处理，读到 None 时结束"""
+    while True:
+        try:
+            item = source.get()
+        except (EOFError, OSError):
+            item = ("stop",)
+        if item is None:
+            return
+        try:
+            loop.call_soon_threadsafe(handler, item)
+        except RuntimeError:
+            # 事件循环已关闭
+            return
+        if item[0] == "stop":
+            return
+
+
+def _worker_main(index: int, count: int, config: dict, inbox, outbox):
+    """工作进程入口"""
+    try:
+        asyncio.run(_worker_loop(index, count, config, inbox, outbox))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker_loop(index: int, count: int, config: dict, inbox, outbox):
+    loop = asyncio.get_running_loop()
+    relay = RelayMessenger(index, outbox)
+    # 限速和重试由插件进程统一负责，工作进程只保留并发上限
+    config = dict(config, send_rate=0, send_retries=0, send_concurrency=max(64, config.get("send_concurrency", 5)))
+    # 房间数上限是全部进程合计的上限，按进程数平均分摊
+    max_sessions = config.get("max_sessions", 500)
+    if max_sessions > 0:
+        config["max_sessions"] = math.ceil(max_sessions / count)
+    app = WerewolfApp(
+        config,
+        relay,
+        shard=(index, count),
+        on_bind=lambda user_id, bound: outbox.put(("bind", index, user_id, bound)),
+        on_room=lambda group_id, opened: outbox.put(("room", index, group_id, opened)),
+    )
+    stopped = loop.create_future()
+    tasks = set()
+
+    async def handle(message: IncomingMessage):
+        try:
+            await app.handle(message)
+        except Exception as e:
+            logger.error(f"[挂科狼人杀] 工作进程 {index} 处理消息失败: {e}", exc_info=True)
+
+    def on_item(item):
+        if item[0] == "event":
+            task = loop.create_task(handle(item[1]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        elif item[0] == "ack":
+            relay.ack(item[1], item[2])
+        elif item[0] == "stop" and not stopped.done():
+            stopped.set_result(None)
+
+    # 先开始读取队列：恢复游戏时发出的消息也要等插件进程确认
+    reader = threading.Thread(target=_read_queue, args=(inbox, loop, on_item), daemon=True)
+    reader.start()
+    await app.initialize()
+    await stopped
+
+    relay.fail_all("插件已停止")
+    await app.terminate()
+    for task in list(tasks):
+        task.cancel()
+    logger.info(f"[挂科狼人杀] 工作进程 {index} 已停止")
+
+
+class ShardedApp:
+    """插件进程侧：启动工作进程、按群号转发消息并代发消息"""
+
+    def __init__(self, config, messenger, workers: int):
+        self.config = dict(config)
+        self.workers = workers
+        self.messenger = FanoutMessenger(
+            messenger,
+            concurrency=config.get("send_concurrency", 5),
+            rate=config.get("send_rate", 10),
+            burst=config.get("send_burst", 10),
+            retries=config.get("send_retries", 1),
+        )
+        # 工作进程通过 spawn 启动，不继承插件进程的事件循环与线程
+        self._mp = multiprocessing.get_context("spawn")
+        self._inboxes = [self._mp.Queue() for _ in range(workers)]
+        self._outbox = self._mp.Queue()
+        self._processes: List[multiprocessing.process.BaseProcess] = []
+        self._reader: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = set()
+        # 重复投递的事件在转发前丢弃
+        self.recent_ids = RecentIds()
+        # 玩家 -> 所在房间的工作进程，用于转发私聊指令
+        self.user_shard: Dict[str, int] = {}
+        # 有房间的群，其余群只转发看起来像指令的消息
+        self.active_groups: Set[str] = set()
+        # 插件进程自己的指标（代发消息、重复投递）写到 metrics.prom，工作进程各写 metrics-<序号>.prom
+        self.metrics_path = os.path.join(config.get("data_dir") or DEFAULT_DATA_DIR, "metrics.prom")
+        self.metrics_interval = config.get("metrics_interval", 0)
+        self._metrics_task: Optional[asyncio.Task] = None
+
+    async def initialize(self):
+        """启动工作进程，各进程自行恢复属于自己的游戏"""
+        self._loop = asyncio.get_running_loop()
+        for index in range(self.workers):
+            process = self._mp.Process(
+                target=_worker_main,
+                args=(index, self.workers, self.config, self._inboxes[index], self._outbox),
+                name=f"werewolf-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+        self._reader = threading.Thread(
+            target=_read_queue, args=(self._outbox, self._loop, self._on_item), daemon=True,
+        )
+        self._reader.start()
+        if self.metrics_interval > 0:
+            self._metrics_task = asyncio.create_task(self._dump_metrics())
+        logger.info(f"[挂科狼人杀] 已启动 {self.workers} 个工作进程")
+
+    async def _dump_metrics(self):
+        """每 metrics_interval 秒把插件进程的指标写到文件"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            try:
+                await loop.run_in_executor(None, REGISTRY.write, self.metrics_path)
+            except OSError as e:
+                logger.error(f"[挂科狼人杀] 写入指标文件失败: {e}")
+
+    def route(self, message: IncomingMessage) -> int:
+        """消息应转发到的工作进程：群消息按群号，私聊按玩家所在房间"""
+        if message.group_id:
+            return shard_for(message.group_id, self.workers)
+        index = self.user_shard.get(message.sender_id)
+        if index is None:
+            index = shard_for(message.sender_id, self.workers)
+        return index
+
+    def accepts(self, group_id: str, sender_id: str, text: str) -> bool:
+        """构造 IncomingMessage 之前的快速预检，规则与 WerewolfApp.accepts 相同：
+        有房间的群、已在房间中的玩家的私聊，以及看起来像指令的消息才转发给工作进程"""
+        if group_id:
+            if group_id in self.active_groups:
+                return True
+        elif sender_id in self.user_shard:
+            return True
+        return text.startswith(WerewolfApp.COMMAND_PREFIXES)
+
+    async def handle(self, message: IncomingMessage):
+        """转发一条消息"""
+        if not self.accepts(message.group_id, message.sender_id, message.text):
+            return
+        # 只有像指令的消息才按消息 id 去重，有房间的群里的普通聊天不占用去重表（工作进程会丢弃）
+        if message.text.startswith(WerewolfApp.COMMAND_PREFIXES) and self.recent_ids.seen(message.message_id):
+            return
+        self._inboxes[self.route(message)].put(("event", message))
+
+    def _on_item(self, item):
+        if item[0] == "send":
+            task = self._loop.create_task(self._relay_send(*item[1:]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif item[0] == "bind":
+            _, index, user_id, bound = item
+            if bound:
+                self.user_shard[user_id] = index
+            elif self.user_shard.get(user_id) == index:
+                del self.user_shard[user_id]
+        elif item[0] == "room":
+            _, index, group_id, opened = item
+            if opened:
+                self.active_groups.add(group_id)
+            else:
+                self.active_groups.discard(group_id)
+
+    async def _relay_send(self, worker: int, req_id: int, kind: str, target: str, content: str):
+        error = None
+        try:
+            if kind == "group":
+                await self.messenger.send_group(target, content)
+            else:
+                await self.messenger.send_private(target, content)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        self._inboxes[worker].put(("ack", req_id, error))
+
+    async def terminate(self):
+        """通知工作进程停止并等待退出"""
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+            self._metrics_task = None
+        for inbox in self._inboxes:
+            inbox.put(("stop",))
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, 10)
+            if process.is_alive():
+                logger.warning(f"[挂科狼人杀] 工作进程 {process.name} 未能按时退出，强制结束")
+                process.terminate()
+        self._processes.clear()
+        if self._reader is not None:
+            self._outbox.put(None)
+            self._reader.join(1)
+            self._reader = None
+        for task in list(self._tasks):
+            task.cancel()
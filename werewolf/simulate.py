@@ -0,0 +1,193 @@
+"""无网络批量对局模拟
+
+直接驱动 GameEngine，不经过 AstrBot 和任何定时器，用于规则回归和平衡性统计：
+
+    python -m werewolf.simulate --games 1000 --players 8 --seed 42
+
+加上 --min-rate 可以作为性能回归检查：吞吐量低于给定的局/秒时以非零状态退出。
+"""
+import sys
+import time
+import random
+import argparse
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from collections import Counter
+
+from .engine import GameEngine, RuleError
+from .models import DeathCause, Player, Role, WEREWOLF_ROLES
+from .settings import GameSettings
+
+# 超过这个天数仍未分出胜负则记为平局
+MAX_DAYS = 50
+
+
+class Agent:
+    """模拟玩家的决策接口，返回 None 表示不行动/弃票"""
+
+    def night_action(self, engine: GameEngine, player: Player) -> Optional[str]:
+        return None
+
+    def vote(self, engine: GameEngine, player: Player) -> Optional[str]:
+        return None
+
+    def take(self, engine: GameEngine, player: Player, candidates: List[Player]) -> Optional[Player]:
+        return None
+
+
+class RandomAgent(Agent):
+    """随机决策：挂科生随机挂一名非队友，任课老师随机救人，其他人随机投票"""
+
+    def night_action(self, engine: GameEngine, player: Player) -> Optional[str]:
+        alive = engine.index.alive_players()
+        if player.role == Role.BAD_STUDENT:
+            targets = [p for p in alive if p.role not in WEREWOLF_ROLES]
+            return engine.rng.choice(targets).user_name if targets else None
+        if player.role == Role.TEACHER:
+            return "救" + engine.rng.choice(alive).user_name
+        return engine.rng.choice(alive).user_name
+
+    def vote(self, engine: GameEngine, player: Player) -> Optional[str]:
+        targets = [p for p in engine.index.alive_players() if p.user_id != player.user_id]
+        return engine.rng.choice(targets).user_name if targets else None
+
+    def take(self, engine: GameEngine, player: Player, candidates: List[Player]) -> Optional[Player]:
+        return engine.rng.choice(candidates) if candidates else None
+
+
+class ScriptedAgent(Agent):
+    """按预设脚本行动，脚本用完后交给 fallback（默认不行动）"""
+
+    def __init__(
+        self,
+        night: Optional[List[Optional[str]]] = None,
+        votes: Optional[List[Optional[str]]] = None,
+        fallback: Optional[Agent] = None,
+    ):
+        self.night = list(night or [])
+        self.votes = list(votes or [])
+        self.fallback = fallback or Agent()
+
+    def night_action(self, engine: GameEngine, player: Player) -> Optional[str]:
+        if self.night:
+            return self.night.pop(0)
+        return self.fallback.night_action(engine, player)
+
+    def vote(self, engine: GameEngine, player: Player) -> Optional[str]:
+        if self.votes:
+            return self.votes.pop(0)
+        return self.fallback.vote(engine, player)
+
+    def take(self, engine: GameEngine, player: Player, candidates: List[Player]) -> Optional[Player]:
+        return self.fallback.take(engine, player, candidates)
+
+
+@dataclass
+class GameRecord:
+    """一局模拟的结果"""
+    seed: Optional[int]
+    winner: Optional[str]  # 获胜阵营，平局为 None
+    days: int
+    deaths: List[str] = field(default_factory=list)  # "昵称:出局原因"
+
+
+def _eliminate(engine: GameEngine, agents: Dict[str, Agent], player: Player, cause: DeathCause, record: GameRecord):
+    """淘汰玩家，并让助教通过 agent 选择带走目标"""
+    deaths = engine.eliminate(player, cause)
+    while True:
+        record.deaths.extend(f"{d.player.user_name}:{d.cause.value}" for d in deaths)
+        shooter = engine.next_shooter()
+        if shooter is None:
+            return
+        target = agents[shooter.user_id].take(engine, shooter, engine.shoot_candidates(shooter))
+        deaths = engine.shoot(shooter, target) if target else []
+
+
+def play_game(
+    settings: GameSettings,
+    player_count: int,
+    seed: Optional[int] = None,
+    agents: Optional[Dict[str, Agent]] = None,
+) -> GameRecord:
+    """完整模拟一局，同一 seed 与 agents 的结果完全一致
+
+    agents 以 user_id（"p0"、"p1"...）为键，缺省的玩家使用 RandomAgent。
+    """
+    engine = GameEngine(settings, random.Random(seed))
+    engine.open_registration()
+    for i in range(player_count):
+        engine.add_player(f"p{i}", f"玩家{i}")
+    engine.start_game()
+
+    default = RandomAgent()
+    agents = {uid: (agents or {}).get(uid, default) for uid in engine.players}
+    record = GameRecord(seed=seed, winner=None, days=0)
+
+    while engine.day_count < MAX_DAYS:
+        # 夜晚
+        for player in engine.begin_night():
+            action = agents[player.user_id].night_action(engine, player)
+            if action:
+                try:
+                    engine.submit_night_action(player.user_id, action)
+                except RuleError:
+                    # 与插件一致：不合法的行动被拒绝，视为不行动
+                    pass
+        result = engine.resolve_night()
+        for player in result.killed:
+            _eliminate(engine, agents, player, DeathCause.NIGHT_KILL, record)
+        for player in result.poisoned:
+            _eliminate(engine, agents, player, DeathCause.POISON, record)
+        if engine.check_winner():
+            break
+
+        # 白天投票
+        engine.begin_day()
+        engine.begin_vote()
+        for player in engine.index.alive_players():
+            target = agents[player.user_id].vote(engine, player)
+            if target:
+                engine.cast_vote(player.user_id, target)
+        lynched = engine.resolve_votes().lynched
+        if lynched:
+            _eliminate(engine, agents, lynched, DeathCause.VOTE, record)
+        if engine.check_winner():
+            break
+
+    record.days = engine.day_count
+    record.winner = engine.winner.value if engine.winner else None
+    return record
+
+
+def run_batch(settings: GameSettings, player_count: int, games: int, seed: int = 0) -> List[GameRecord]:
+    """批量模拟，第 i 局使用种子 seed + i"""
+    return [play_game(settings, player_count, seed + i) for i in range(games)]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="挂科狼人杀无网络批量模拟")
+    parser.add_argument("--games", type=int, default=1000, help="模拟局数")
+    parser.add_argument("--players", type=int, default=8, help="每局人数")
+    parser.add_argument("--seed", type=int, default=0, help="起始随机种子")
+    parser.add_argument("--min-rate", type=float, default=0, help="最低吞吐量（局/秒），低于此值时返回非零")
+    args = parser.parse_args(argv)
+
+    settings = GameSettings(max_players=max(args.players, GameSettings.max_players))
+    started = time.perf_counter()
+    records = run_batch(settings, args.players, args.games, args.seed)
+    elapsed = time.perf_counter() - started
+
+    winners = Counter(r.winner or "平局" for r in records)
+    print(f"{args.games}局 {args.players}人，用时{elapsed:.2f}秒（{args.games / elapsed:.0f}局/秒）")
+    for camp, count in winners.most_common():
+        print(f"  {camp}: {count}局 ({count / args.games:.1%})")
+    print(f"  平均天数: {sum(r.days for r in records) / args.games:.2f}")
+
+    rate = args.games / elapsed
+    if rate < args.min_rate:
+        print(f"吞吐量 {rate:.0f}局/秒 低于 --min-rate {args.min_rate:.0f}局/秒", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
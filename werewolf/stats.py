@@ -0,0 +1,251 @@
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .models import Camp, Player, get_role_camp
+
+logger = logging.getLogger("astrbot")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id TEXT NOT NULL,
+    winner TEXT,
+    days INTEGER NOT NULL,
+    player_count INTEGER NOT NULL,
+    ended_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    game_id INTEGER NOT NULL REFERENCES games(id),
+    group_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    user_name TEXT NOT NULL,
+    role TEXT NOT NULL,
+    camp TEXT NOT NULL,
+    won INTEGER NOT NULL,
+    survived INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_user ON results(user_id);
+CREATE INDEX IF NOT EXISTS idx_results_group_user ON results(group_id, user_id);
+"""
+
+
+@dataclass
+class UserStats:
+    """个人战绩"""
+    user_id: str
+    user_name: str = ""
+    games: int = 0
+    wins: int = 0
+    by_camp: Dict[str, Tuple[int, int]] = field(default_factory=dict)  # 阵营 -> (场次, 胜场)
+    by_role: List[Tuple[str, int, int]] = field(default_factory=list)  # [(角色, 场次, 胜场)]，按场次降序
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+
+@dataclass
+class RankEntry:
+    """排行榜中的一行"""
+    user_id: str
+    user_name: str
+    games: int
+    wins: int
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+
+class QueryCache:
+    """带过期时间的 LRU 查询缓存"""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None or item[0] < self.clock():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def put(self, key: Hashable, value: Any):
+        self._data[key] = (self.clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+
+class StatsStore:
+    """基于 SQLite 的战绩存储
+
+    所有数据库操作都在一个单线程执行器里进行，不阻塞事件循环，
+    也保证了同一连接上的读写串行；每局结果在一个事务里写入。
+    个人战绩与排行榜的查询结果经 QueryCache 缓存，写入新对局时按群/玩家失效。
+    """
+
+    RANK_LIMIT = 10  # 排行榜人数
+    RANK_MIN_GAMES = 3  # 上榜最少场次
+
+    def __init__(self, path: str, cache_size: int = 256, cache_ttl: float = 60.0):
+        self.path = path
+        self.cache = QueryCache(cache_size, cache_ttl)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="werewolf-stats")
+        self._conn: Optional[sqlite3.Connection] = None
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        """在执行器线程中打开连接（首次使用时建表）"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    async def record_game(
+        self,
+        group_id: str,
+        winner: Optional[Camp],
+        days: int,
+        players: List[Player],
+        survivors: List[str],
+    ):
+        """写入一局的结果"""
+        ended_at = time.time()
+        alive = set(survivors)
+        rows = [
+            (
+                group_id,
+                p.user_id,
+                p.user_name,
+                p.role.value,
+                get_role_camp(p.role).value,
+                int(winner is not None and get_role_camp(p.role) == winner),
+                int(p.user_id in alive),
+            )
+            for p in players
+            if p.role is not None
+        ]
+        if not rows:
+            # 已被重置的对局（没有发过牌的玩家）不计入战绩
+            logger.warning(f"[挂科狼人杀] 跳过没有玩家的对局战绩({group_id})")
+            return
+        try:
+            await self._run(self._insert_game, group_id, winner.value if winner else None, days, ended_at, rows)
+        except sqlite3.Error as e:
+            logger.error(f"[挂科狼人杀] 写入战绩失败({group_id}): {e}")
+            return
+
+        self.cache.pop(("rank", group_id))
+        for row in rows:
+            self.cache.pop(("user", row[1]))
+
+    def _insert_game(self, group_id: str, winner: Optional[str], days: int, ended_at: float, rows: List[tuple]):
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO games (group_id, winner, days, player_count, ended_at) VALUES (?, ?, ?, ?, ?)",
+                (group_id, winner, days, len(rows), ended_at),
+            )
+            game_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO results (game_id, group_id, user_id, user_name, role, camp, won, survived)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(game_id,) + row for row in rows],
+            )
+
+    async def user_stats(self, user_id: str) -> UserStats:
+        """个人战绩（跨群）"""
+        key = ("user", user_id)
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = await self._run(self._query_user, user_id)
+            self.cache.put(key, cached)
+        return cached
+
+    def _query_user(self, user_id: str) -> UserStats:
+        conn = self._connect()
+        stats = UserStats(user_id)
+        row = conn.execute(
+            "SELECT user_name FROM results WHERE user_id = ? ORDER BY rowid DESC LIMIT 1", (user_id,)
+        ).fetchone()
+        if row is None:
+            return stats
+        stats.user_name = row[0]
+        for camp, games, wins in conn.execute(
+            "SELECT camp, COUNT(*), SUM(won) FROM results WHERE user_id = ? GROUP BY camp", (user_id,)
+        ):
+            stats.by_camp[camp] = (games, wins)
+            stats.games += games
+            stats.wins += wins
+        stats.by_role = [
+            (role, games, wins)
+            for role, games, wins in conn.execute(
+                "SELECT role, COUNT(*) AS games, SUM(won) FROM results WHERE user_id = ?"
+                " GROUP BY role ORDER BY games DESC",
+                (user_id,),
+            )
+        ]
+        return stats
+
+    async def leaderboard(self, group_id: str) -> List[RankEntry]:
+        """群排行榜：按胜场、胜率排序，场次不足 RANK_MIN_GAMES 的玩家不上榜"""
+        key = ("rank", group_id)
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = await self._run(self._query_rank, group_id, self.RANK_LIMIT, self.RANK_MIN_GAMES)
+            self.cache.put(key, cached)
+        return cached
+
+    def _query_rank(self, group_id: str, limit: int, min_games: int) -> List[RankEntry]:
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT user_id, MAX(rowid), COUNT(*) AS games, SUM(won) AS wins FROM results"
+            " WHERE group_id = ? GROUP BY user_id HAVING games >= ?"
+            " ORDER BY wins DESC, CAST(wins AS REAL) / games DESC LIMIT ?",
+            (group_id, min_games, limit),
+        ).fetchall()
+        entries = []
+        for user_id, last_rowid, games, wins in rows:
+            name = conn.execute("SELECT user_name FROM results WHERE rowid = ?", (last_rowid,)).fetchone()[0]
+            entries.append(RankEntry(user_id, name, games, wins))
+        return entries
+
+    def close(self):
+        """关闭连接与执行器"""
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        self._executor.submit(_close)
+        self._executor.shutdown(wait=True)
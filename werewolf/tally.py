@@ -0,0 +1,105 @@
+from typing import Dict, List, Optional, Set
+
+
+class VoteTally:
+    """增量计票器
+
+    每次投票/改票只更新受影响的两个目标，并按票数分桶，
+    随时可以 O(1) 得到当前领先者。
+    """
+
+    def __init__(self):
+        self.ballots: Dict[str, str] = {}  # voter_id -> target_id
+        self.counts: Dict[str, int] = {}  # target_id -> 票数
+        self._buckets: Dict[int, Set[str]] = {}  # 票数 -> 目标集合
+        self.max_count = 0
+
+    def __len__(self) -> int:
+        return len(self.ballots)
+
+    def clear(self):
+        self.ballots.clear()
+        self.counts.clear()
+        self._buckets.clear()
+        self.max_count = 0
+
+    def _move(self, target: str, delta: int):
+        old = self.counts.get(target, 0)
+        new = old + delta
+        if old:
+            bucket = self._buckets[old]
+            bucket.discard(target)
+            if not bucket:
+                del self._buckets[old]
+        if new:
+            self.counts[target] = new
+            self._buckets.setdefault(new, set()).add(target)
+        else:
+            self.counts.pop(target, None)
+
+        if new > self.max_count:
+            self.max_count = new
+        while self.max_count and self.max_count not in self._buckets:
+            self.max_count -= 1
+
+    def cast(self, voter: str, target: str) -> Optional[str]:
+        """记录一票，返回该玩家之前投给的目标（没有则为 None）"""
+        previous = self.ballots.get(voter)
+        if previous == target:
+            return previous
+        if previous is not None:
+            self._move(previous, -1)
+        self.ballots[voter] = target
+        self._move(target, 1)
+        return previous
+
+    def retract(self, voter: str):
+        """撤回一票"""
+        previous = self.ballots.pop(voter, None)
+        if previous is not None:
+            self._move(previous, -1)
+
+    def has_voted(self, voter: str) -> bool:
+        return voter in self.ballots
+
+    def leaders(self) -> List[str]:
+        """当前得票最多的目标（可能并列）"""
+        if not self.max_count:
+            return []
+        return list(self._buckets[self.max_count])
+
+    def leader(self) -> Optional[str]:
+        """唯一的领先者，并列或无人投票时为 None"""
+        if not self.max_count:
+            return None
+        bucket = self._buckets[self.max_count]
+        if len(bucket) != 1:
+            return None
+        return next(iter(bucket))
+
+    def runner_up_count(self) -> int:
+        """第二名的票数（并列第一时等于最高票数）"""
+        if not self.max_count:
+            return 0
+        if len(self._buckets[self.max_count]) > 1:
+            return self.max_count
+        count = self.max_count - 1
+        while count and count not in self._buckets:
+            count -= 1
+        return count
+
+    def is_decided(self, eligible: int, allow_revote: bool = False) -> bool:
+        """剩余选票已无法改变结果时返回 True
+
+        不允许改票时：所有人都投完，或领先者的优势大于未投票数。
+        允许改票时：已投出的票随时可能改变，即使领先者过半也不能提前结束，
+        只有所有人都投完才结束。
+        """
+        remaining = eligible - len(self.ballots)
+        if remaining <= 0:
+            return True
+        if allow_revote:
+            return False
+        if self.leader() is None:
+            return False
+        return self.max_count - self.runner_up_count() > remaining
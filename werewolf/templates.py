@@ -0,0 +1,87 @@
+"""消息模板
+
+固定文本在导入时编译成 str.format 模板；与角色相关的身份卡和夜晚提示
+按角色预先渲染一次并缓存，发牌和入夜时只需填入少量对局数据。
+"""
+from functools import lru_cache
+
+from .models import Role
+from .roles import NO_NIGHT_ACTION, get_role_description, get_role_night_action
+
+REGISTRATION_OPEN = (
+    "🎮 【挂科版狼人杀】游戏报名开始！\n"
+    "📢 主持人：@{master}\n"
+    "👥 人数：{min_players}-{max_players}人\n"
+    "⏰ 报名时间：{minutes}分钟\n\n"
+    "输入【报名】或【join】加入游戏\n"
+    "输入【开始游戏】或【start】开始游戏（需至少{min_players}人）"
+)
+
+REGISTERED_GROUP = "✅ {name} 已报名\n📊 当前报名人数：{count}/{max_players}"
+
+REGISTERED_PRIVATE = "✅ 报名成功！\n请等待游戏开始，当前报名人数：{count}人"
+
+GAME_START = (
+    "🎮 【挂科版狼人杀】游戏开始！\n"
+    "👥 玩家数量：{count}人\n"
+    "🌙 现在是第{day}天夜晚\n"
+    "📢 请查看私聊获取你的身份"
+)
+
+NIGHT_START = (
+    "🌙 第{day}天夜晚开始！\n"
+    "⏰ 请有夜晚行动能力的玩家在{timeout}秒内完成行动\n"
+    "💤 其他玩家请耐心等待..."
+)
+
+DAY_START = (
+    "☀️ 第{day}天白天开始！\n"
+    "🗣️ 请玩家依次发言讨论\n"
+    "⏰ 讨论时间：{timeout}秒\n"
+    "发言格式：/发言 你的发言内容"
+)
+
+VOTE_START = (
+    "🗳️ 开始投票！\n"
+    "👥 存活玩家：{roster}\n"
+    "⏰ 投票时间：{timeout}秒\n"
+    "📝 投票格式：/投票 玩家名称\n"
+    "💡 得票最多的玩家将被退学（淘汰）"
+)
+
+TEACHING_ASSISTANT_PROMPT = (
+    "💥 {name}（助教）发动技能！\n"
+    "助教可以在被淘汰时带走一名学生\n"
+    "请在{timeout}秒内选择要带走的学生：/带走 学生名称"
+)
+
+GAME_END_FOOTER = "\n🎮 感谢参与挂科版狼人杀！"
+
+
+@lru_cache(maxsize=None)
+def role_card(role: Role) -> str:
+    """身份卡（不含队友信息）"""
+    night_action = get_role_night_action(role)
+    return (
+        f"🎭 你的身份是：{role.value}\n\n"
+        f"📋 角色能力：\n{get_role_description(role)}\n\n"
+        f"🌙 夜晚行动：{night_action if night_action != NO_NIGHT_ACTION else '请等待天亮'}"
+    )
+
+
+def role_card_with_teammates(role: Role, teammates: str) -> str:
+    """挂科阵营的身份卡，在能力说明后附上队友"""
+    card = role_card(role)
+    head, sep, tail = card.rpartition("\n\n🌙 ")
+    return f"{head}\n\n👥 你的挂科生队友：{teammates}{sep}{tail}"
+
+
+@lru_cache(maxsize=None)
+def night_prompt(role: Role) -> str:
+    """夜晚行动提示模板，剩余字段为 {day} 与 {timeout}"""
+    action = get_role_night_action(role).replace("{", "{{").replace("}", "}}")
+    return (
+        "🌙 第{day}天夜晚\n"
+        f"请进行你的夜晚行动：\n{action}\n"
+        "⏰ 请在{timeout}秒内完成（不行动请发送 /行动 跳过）"
+    )
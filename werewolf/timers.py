@@ -0,0 +1,122 @@
+import time
+import heapq
+import asyncio
+import logging
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger("astrbot")
+
+
+class TimerHandle:
+    """截止时间句柄"""
+
+    __slots__ = ("when", "callback", "cancelled", "fired")
+
+    def __init__(self, when: float, callback: Callable[[], None]):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+        self.fired = False
+
+    @property
+    def active(self) -> bool:
+        return not (self.cancelled or self.fired)
+
+
+class DeadlineService:
+    """所有房间共用的截止时间服务：一个最小堆 + 一个驱动任务
+
+    schedule/reschedule/cancel 都是 O(log n)，驱动任务只在最近的截止时间到达
+    （或有更早的截止时间加入）时才被唤醒。被取消或改期的旧堆项采用惰性删除。
+    回调是同步函数，需要执行协程时由回调自行创建任务，避免阻塞其他截止时间。
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._heap: List[Tuple[float, int, TimerHandle]] = []
+        self._seq = 0
+        self._stale = 0  # 堆中已失效的项数
+        self._driver: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._stale
+
+    def schedule(self, when: float, callback: Callable[[], None]) -> TimerHandle:
+        """在 when（clock 时间）执行 callback"""
+        handle = TimerHandle(when, callback)
+        self._push(handle)
+        return handle
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> TimerHandle:
+        return self.schedule(self.clock() + delay, callback)
+
+    def reschedule(self, handle: TimerHandle, when: float):
+        """修改截止时间"""
+        if not handle.active:
+            return
+        self._stale += 1
+        handle.when = when
+        self._push(handle)
+
+    def cancel(self, handle: TimerHandle):
+        if not handle.active:
+            return
+        handle.cancelled = True
+        self._stale += 1
+        self._compact()
+
+    def close(self):
+        """停止驱动任务并丢弃所有截止时间"""
+        for _, _, handle in self._heap:
+            handle.cancelled = True
+        self._heap.clear()
+        self._stale = 0
+        if self._driver is not None:
+            self._driver.cancel()
+            self._driver = None
+
+    def _push(self, handle: TimerHandle):
+        self._seq += 1
+        heapq.heappush(self._heap, (handle.when, self._seq, handle))
+        self._compact()
+        if self._driver is None or self._driver.done():
+            self._wakeup = asyncio.Event()
+            self._driver = asyncio.create_task(self._drive())
+        elif self._heap[0][2] is handle:
+            # 新的截止时间最早，唤醒驱动任务重新计算等待时间
+            self._wakeup.set()
+
+    def _compact(self):
+        if self._stale > 64 and self._stale * 2 > len(self._heap):
+            self._heap = [e for e in self._heap if e[2].active and e[2].when == e[0]]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    async def _drive(self):
+        try:
+            while self._heap:
+                when, _, handle = self._heap[0]
+                if not handle.active or handle.when != when:
+                    heapq.heappop(self._heap)
+                    self._stale = max(0, self._stale - 1)
+                    continue
+
+                delay = when - self.clock()
+                if delay > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                heapq.heappop(self._heap)
+                handle.fired = True
+                try:
+                    handle.callback()
+                except Exception as e:
+                    logger.error(f"[挂科狼人杀] 定时回调执行失败: {e}", exc_info=True)
+        finally:
+            if self._driver is asyncio.current_task():
+                self._driver = None
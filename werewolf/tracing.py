@@ -0,0 +1,161 @@
+"""按房间记录的追踪 span，导出为 Chrome trace-event JSON
+
+在 chrome://tracing 或 https://ui.perfetto.dev 中打开导出的文件，
+即可看到一局游戏中每个阶段、每次发送各花了多少时间。
+每个 asyncio 任务显示为一条独立的轨道，并发的私聊发送不会互相重叠。
+
+GameSession 在进入阶段时通过 Tracer.span() 把自己的 tracer 放进 contextvar，
+共享组件（如 FanoutMessenger）用模块级的 span() 挂到当前房间的追踪上；
+没有开启追踪时 span() 只做一次 contextvar 读取。
+"""
+import os
+import json
+import time
+import asyncio
+import functools
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+_current: ContextVar[Optional["Tracer"]] = ContextVar("werewolf_tracer", default=None)
+
+
+class Tracer:
+    """单个房间的 span 记录器"""
+
+    def __init__(self, name: str, directory: Optional[str] = None, max_events: int = 20000, clock=time.perf_counter):
+        self.name = name
+        self.directory = directory  # 导出目录
+        self.max_events = max_events
+        self.clock = clock
+        self.events: List[Dict[str, Any]] = []
+        self.dropped = 0  # 超过 max_events 后丢弃的 span 数
+        self._origin = clock()
+        self._tids: Dict[int, int] = {}  # id(task) -> 轨道号
+        self._thread_names: Dict[int, str] = {}
+
+    def _tid(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else 0
+        tid = self._tids.get(key)
+        if tid is None:
+            tid = self._tids[key] = len(self._tids) + 1
+            self._thread_names[tid] = task.get_name() if task is not None else "main"
+        return tid
+
+    def _us(self, t: float) -> float:
+        return round((t - self._origin) * 1e6, 1)
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[None]:
+        """记录 with 块的起止时间，块内的 span() 调用都归到本 tracer"""
+        token = _current.set(self)
+        tid = self._tid()
+        started = self.clock()
+        try:
+            yield
+        finally:
+            ended = self.clock()
+            _current.reset(token)
+            self._add({
+                "name": name,
+                "cat": "werewolf",
+                "ph": "X",
+                "ts": self._us(started),
+                "dur": self._us(ended) - self._us(started),
+                "pid": 1,
+                "tid": tid,
+                "args": args,
+            })
+
+    def instant(self, name: str, **args):
+        """记录一个时间点事件"""
+        self._add({
+            "name": name,
+            "cat": "werewolf",
+            "ph": "i",
+            "s": "t",
+            "ts": self._us(self.clock()),
+            "pid": 1,
+            "tid": self._tid(),
+            "args": args,
+        })
+
+    def _add(self, event: Dict[str, Any]):
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        self.events.append(event)
+
+    def clear(self):
+        self.events.clear()
+        self.dropped = 0
+        self._origin = self.clock()
+        self._tids.clear()
+        self._thread_names.clear()
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Chrome trace-event 格式"""
+        metadata = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": self.name}}]
+        metadata.extend(
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+            for tid, name in self._thread_names.items()
+        )
+        return {
+            "traceEvents": metadata + sorted(self.events, key=lambda e: e["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": {"dropped": self.dropped},
+        }
+
+    def export(self, path: str):
+        """写入 JSON 文件"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f, ensure_ascii=False)
+
+
+# 关闭追踪时共用的空上下文
+_NOOP = nullcontext()
+
+
+def span(name: str, **args):
+    """在当前房间的 tracer 上记录 span，没有 tracer 时什么也不做"""
+    tracer = _current.get()
+    if tracer is None:
+        return _NOOP
+    return tracer.span(name, **args)
+
+
+class NullTracer:
+    """关闭追踪时使用，接口与 Tracer 相同"""
+
+    events: List[Dict[str, Any]] = []
+    directory = None
+
+    def span(self, name: str, **args):
+        return _NOOP
+
+    def instant(self, name: str, **args):
+        pass
+
+    def clear(self):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+def traced(name: str):
+    """把异步方法包在 self.tracer 的 span 中"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            with self.tracer.span(name):
+                return await func(self, *args, **kwargs)
+        return wrapper
+    return decorator